@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Memory of resource objects created from responses, without memory of the responses.
+
+Results are printed or saved as JSON like results of ``benchmarks/run.py``::
+
+    python -m benchmarks.memory --output before.json
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+
+from tests.mockserver import MockTFSServer
+from tfs import TFSAPI
+from tfs import Workitem
+from tfs.resources import raw2resource
+
+
+def allocated(function, count):
+    """Bytes allocated by the function and kept in its result, per item"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return (after - before) / count
+
+
+def measure(raw_workitems, lazy):
+    client = TFSAPI("http://127.0.0.1/tfs", pat="token", lazy=lazy)
+    count = len(raw_workitems)
+    wrappers = [
+        {"name": "Item {}".format(x), "attributes": {"isLocked": False}}
+        for x in range(count)
+    ]
+
+    return {
+        # With nested relations and their attributes
+        "workitem_bytes": allocated(
+            lambda: [Workitem(client, x) for x in raw_workitems], count
+        ),
+        # With the nested wrapper of attributes
+        "top_level_wrapper_bytes": allocated(
+            lambda: [raw2resource(x, tfs=client, lazy=lazy) for x in wrappers],
+            count,
+        ),
+    }
+
+
+def run(args):
+    server = MockTFSServer(workitems=args.workitems)
+    try:
+        raw = server.workitems_response(range(1, args.workitems + 1))["value"]
+    finally:
+        server.stop()
+
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "config": {"workitems": args.workitems},
+        "results": {"eager": measure(raw, False), "lazy": measure(raw, True)},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workitems", type=int, default=10000)
+    parser.add_argument("--output", help="JSON file, results are printed by default")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    text = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
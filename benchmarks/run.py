@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the client against the local TFS stand-in server of ``tests/mockserver.py``.
+
+Results are printed or saved as JSON to compare performance changes of the client.
+Run them from the root of the repository::
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --latency 0.02 --transport httpx --only get_workitems run_wiql
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from tests.mockserver import COLLECTION
+from tests.mockserver import MockTFSServer
+from tfs import AdaptiveRateLimiter
+from tfs import RequestMetrics
+from tfs import TFSAPI
+from tfs.resources import class_for_resource
+
+
+def bench_get_workitems(client, server, args):
+    ids = list(range(1, args.workitems + 1))
+    workitems = client.get_workitems(ids, max_workers=args.max_workers)
+    assert len(workitems) == len(ids)
+    return len(workitems)
+
+
+def bench_get_workitem_rows(client, server, args):
+    ids = list(range(1, args.workitems + 1))
+    rows = client.get_workitem_rows(
+        ids, ["System.Title", "System.State"], max_workers=args.max_workers
+    )
+    assert len(rows) == len(ids)
+    return len(rows)
+
+
+def bench_run_wiql(client, server, args):
+    wiql = client.run_wiql("SELECT [System.Id] FROM workitems")
+    workitems = wiql.workitems
+    assert len(workitems) == args.workitems
+    return len(workitems)
+
+
+def bench_get_changesets(client, server, args):
+    changesets = client.get_changesets(top=args.changesets)
+    assert len(changesets) == args.changesets
+    return len(changesets)
+
+
+def bench_download_file(client, server, args):
+    url = server.url_of("_apis/wit/attachments/1")
+    with tempfile.TemporaryDirectory() as directory:
+        stats = client.download_file(
+            url, os.path.join(directory, "attachment.bin"), segments=args.segments
+        )
+    assert stats.bytes == args.file_size
+    return stats.bytes
+
+
+def bench_parse(client, server, args):
+    """Decode the response and create work items without HTTP requests"""
+    if not hasattr(args, "parse_body"):
+        ids = range(1, args.workitems + 1)
+        args.parse_body = client.rest_client.codec.dumps(server.workitems_response(ids))
+    raw = client.rest_client.codec.loads(args.parse_body)["value"]
+    tfs_class = class_for_resource(raw[0]["url"])
+    workitems = [tfs_class(tfs=client, raw=x, listVersion=True) for x in raw]
+    titles = [x["Title"] for x in workitems]
+    assert len(titles) == args.workitems
+    return len(workitems)
+
+
+def bench_parse_varied_fields(client, server, args):
+    """Like ``parse``, but TFS omits empty fields: work items have different fields
+    and some of the read fields are missing
+    """
+    if not hasattr(args, "varied_body"):
+        response = server.workitems_response(range(1, args.workitems + 1))
+        for workitem in response["value"]:
+            fields = workitem["fields"]
+            for i, name in enumerate(list(fields)):
+                if name != "System.Id" and (workitem["id"] + i) % 3 == 0:
+                    del fields[name]
+        args.varied_body = client.rest_client.codec.dumps(response)
+    raw = client.rest_client.codec.loads(args.varied_body)["value"]
+    tfs_class = class_for_resource(raw[0]["url"])
+    workitems = [tfs_class(tfs=client, raw=x, listVersion=True) for x in raw]
+    values = [
+        (x["Title"], x["State"], x.get("Tags"), x["Microsoft.VSTS.Common.Priority"])
+        for x in workitems
+    ]
+    assert len(values) == args.workitems
+    return len(workitems)
+
+
+def resource_urls(value, urls):
+    """Urls of nested resources which are converted by ``raw2resource``"""
+    if isinstance(value, dict):
+        if isinstance(value.get("url"), str):
+            urls.append(value["url"])
+        for item in value.values():
+            resource_urls(item, urls)
+    elif isinstance(value, list):
+        for item in value:
+            resource_urls(item, urls)
+    return urls
+
+
+def bench_class_for_resource(client, server, args):
+    """Find classes for urls of work items and their relations"""
+    if not hasattr(args, "dispatch_urls"):
+        ids = range(1, args.workitems + 1)
+        args.dispatch_urls = resource_urls(server.workitems_response(ids), [])
+    for url in args.dispatch_urls:
+        class_for_resource(url)
+    return len(args.dispatch_urls)
+
+
+BENCHMARKS = {
+    "get_workitems": (bench_get_workitems, "items"),
+    "get_workitem_rows": (bench_get_workitem_rows, "items"),
+    "run_wiql": (bench_run_wiql, "items"),
+    "get_changesets": (bench_get_changesets, "items"),
+    "download_file": (bench_download_file, "bytes"),
+    "parse": (bench_parse, "items"),
+    "parse_varied_fields": (bench_parse_varied_fields, "items"),
+    "class_for_resource": (bench_class_for_resource, "lookups"),
+}
+
+
+def run_benchmark(name, client, server, metrics, args):
+    function, unit = BENCHMARKS[name]
+    # Warm up connections and caches of the first run
+    try:
+        function(client, server, args)
+    except Exception:
+        # Injected errors, which are not retried, are counted in the runs
+        pass
+    server.reset_stats()
+    metrics.reset()
+
+    seconds = []
+    count = None
+    errors = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        try:
+            count = function(client, server, args)
+        except Exception as e:
+            errors.append("{}: {}".format(type(e).__name__, e))
+            continue
+        seconds.append(time.perf_counter() - started)
+
+    median = statistics.median(seconds) if seconds else None
+    requests = sum(x["count"] for x in metrics.snapshot().values())
+    return {
+        "unit": unit,
+        "count": count,
+        "seconds": seconds,
+        "best": min(seconds) if seconds else None,
+        "median": median,
+        "{}_per_second".format(unit): count / median if median else None,
+        "requests_per_run": requests / args.repeat,
+        "failed_runs": len(errors),
+        "errors": errors,
+        "server": dict(server.stats),
+    }
+
+
+def run(args):
+    server = MockTFSServer(
+        workitems=args.workitems,
+        changesets=args.changesets,
+        file_size=args.file_size,
+        latency=args.latency,
+        throttle_every=args.throttle_every,
+        retry_after=0,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        api_version=args.api_version,
+    )
+    metrics = RequestMetrics()
+    rate_limiter = None
+    if args.throttle_every or args.error_rate:
+        rate_limiter = AdaptiveRateLimiter(rate=1000.0, max_rate=1000.0, backoff=0.01)
+
+    with server:
+        client = TFSAPI(
+            server.url,
+            "{}/MyProject".format(COLLECTION),
+            "username",
+            "password",
+            pool_maxsize=max(10, args.max_workers, args.segments),
+            rate_limiter=rate_limiter,
+            instrumentation=metrics,
+            transport=args.transport,
+            json_codec=args.json_codec,
+            lazy=args.lazy,
+        )
+        try:
+            results = {
+                name: run_benchmark(name, client, server, metrics, args)
+                for name in args.only
+            }
+        finally:
+            client.rest_client.transport.close()
+
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "transport": client.rest_client.transport.name,
+        "json_codec": client.rest_client.codec.name,
+        "config": {
+            name: value
+            for name, value in vars(args).items()
+            if name not in ("output", "parse_body", "varied_body", "dispatch_urls")
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workitems", type=int, default=2000)
+    parser.add_argument("--changesets", type=int, default=5000)
+    parser.add_argument("--file-size", type=int, default=16 * 1024 * 1024)
+    parser.add_argument("--segments", type=int, default=1)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-every", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--error-status",
+        type=int,
+        default=503,
+        help="status of injected errors, 503 is retried, 500 fails the run",
+    )
+    parser.add_argument("--api-version", default="1.0")
+    parser.add_argument("--transport", default="requests")
+    parser.add_argument("--json-codec", default="auto")
+    parser.add_argument(
+        "--lazy", action="store_true", help="create nested objects on access"
+    )
+    parser.add_argument("--output", help="JSON file, results are printed by default")
+    args = parser.parse_args(argv)
+    args.only = args.only or list(BENCHMARKS)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,12 +30,19 @@ setup(
         "pytest==3.1.2",
         "HTTPretty",
         "pytest_httpretty",
+        "aiohttp",
+        "httpx[http2]",
     ],
     install_requires=[
         "requests",
         "requests_ntlm",
         "six",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "http2": ["httpx[http2]"],
+        "orjson": ["orjson"],
+    },
     package_data={
         "": [
             "../LICENSE",
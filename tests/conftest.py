@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+import itertools
+import json
 import os
 import re
+import threading
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 from urllib.parse import urlparse
 
 import httpretty
@@ -25,6 +31,94 @@ def request_callback_get(request, uri, headers):
     return code, headers, response
 
 
+def workitems_by_ids(ids):
+    # Unknown ids are copied from the first one
+    response_file = "tests/resources/_apis/wit/workitems/response.json"
+    with open(response_file, mode="r", encoding="utf-8-sig") as f:
+        known = {str(x["id"]): x for x in json.load(f)["value"]}
+
+    workitems = []
+    for id_ in map(str, ids):
+        workitem = deepcopy(known.get(id_, known["100"]))
+        workitem["id"] = int(id_)
+        workitem["url"] = workitem["url"].rsplit("/", 1)[0] + "/" + id_
+        workitems.append(workitem)
+    return workitems
+
+
+def request_callback_workitems(request, uri, headers):
+    # Serve only requested work items
+    ids = request.querystring["ids"][0].split(",")
+    workitems = workitems_by_ids(ids)
+    return 200, headers, json.dumps({"count": len(workitems), "value": workitems})
+
+
+def request_callback_workitemsbatch(request, uri, headers):
+    body = json.loads(request.body)
+    if len(body["ids"]) > 200:
+        return 400, headers, json.dumps({"message": "Too many ids"})
+    workitems = workitems_by_ids(body["ids"])
+    if body.get("fields"):
+        for workitem in workitems:
+            workitem["fields"] = {
+                k: v for k, v in workitem["fields"].items() if k in body["fields"]
+            }
+    headers["content-type"] = "application/json; charset=utf-8; api-version=5.0"
+    return 200, headers, json.dumps({"count": len(workitems), "value": workitems})
+
+
+new_workitem_ids = itertools.count(5000)
+
+
+def request_callback_wit_batch(request, uri, headers):
+    # Apply JSON patch operations to work items copied from the first one with rev 1
+    # New work items (uri ends with $Type) get ids from 5000, title "Invalid" fails creation
+    responses = []
+    for item in json.loads(request.body):
+        last = urlparse(item["uri"]).path.rsplit("/", 1)[1]
+        id_ = next(new_workitem_ids) if last.startswith("$") else int(last)
+        workitem = workitems_by_ids([id_])[0]
+        workitem["relations"] = []
+        code = 200
+        message = None
+        for operation in item["body"]:
+            if operation["op"] == "test" and operation["path"] == "/rev":
+                if operation["value"] != workitem["rev"]:
+                    code, message = 412, "Revision mismatch"
+            elif operation["path"] == "/relations/-":
+                workitem["relations"].append(operation["value"])
+            elif operation["path"].startswith("/fields/"):
+                workitem["fields"][operation["path"][8:]] = operation["value"]
+                if operation["value"] == "Invalid":
+                    code, message = 400, "Invalid title"
+        body = workitem if code == 200 else {"message": message}
+        responses.append(
+            {
+                "code": code,
+                "headers": {"Content-Type": "application/json; charset=utf-8"},
+                "body": json.dumps(body),
+            }
+        )
+    return 200, headers, json.dumps({"count": len(responses), "value": responses})
+
+
+def request_callback_changesets(request, uri, headers):
+    # Serve 23 changesets copied from the first one, page by $top and $skip
+    response_file = "tests/resources/_apis/tfvc/changesets/response.json"
+    with open(response_file, mode="r", encoding="utf-8-sig") as f:
+        template = json.load(f)["value"][0]
+
+    top = int(request.querystring["$top"][0])
+    skip = int(request.querystring.get("$skip", ["0"])[0])
+    changesets = []
+    for id_ in range(1 + skip, min(1 + skip + top, 24)):
+        changeset = deepcopy(template)
+        changeset["changesetId"] = id_
+        changesets.append(changeset)
+
+    return 200, headers, json.dumps({"count": len(changesets), "value": changesets})
+
+
 @pytest.fixture(autouse=True)
 def tfs_server_mock():
     for method in (httpretty.GET, httpretty.POST, httpretty.PUT, httpretty.PATCH):
@@ -36,9 +130,57 @@ def tfs_server_mock():
         )
 
 
-@pytest.fixture()
-def tfsapi():
+@pytest.fixture(
+    params=[("requests", False), ("httpx", False), ("requests", True)],
+    ids=["requests", "httpx", "lazy"],
+)
+def tfsapi(request):
+    transport, lazy = request.param
+    if transport == "httpx":
+        pytest.importorskip("httpx")
     client = TFSAPI(
-        "http://tfs.tfs.ru/tfs", "DefaultCollection/MyProject", "username", "password"
+        "http://tfs.tfs.ru/tfs",
+        "DefaultCollection/MyProject",
+        "username",
+        "password",
+        transport=transport,
+        lazy=lazy,
     )
     yield client
+    client.rest_client.transport.close()
+
+
+class TFSRequestHandler(BaseHTTPRequestHandler):
+    """Serve files from tests/resources like ``request_callback_get`` does"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+
+        uri = "http://{}{}".format(self.headers["Host"], self.path)
+        code, _, response = request_callback_get(None, uri, {})
+        body = response.encode("utf-8")
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_PUT = do_PATCH = do_GET
+
+
+@pytest.fixture()
+def tfs_server():
+    """Real HTTP server on localhost, for clients which can't be mocked by httpretty"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TFSRequestHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield "http://127.0.0.1:{}/tfs".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in of TFS server for benchmarks and tests of real HTTP clients.
+
+Files of ``tests/resources`` are served like ``request_callback_get`` does, work items,
+query results, changesets and attachments can be synthesized in any number.
+Latency, throttling and server errors can be injected.
+
+Run it from the root of the repository::
+
+    python -m tests.mockserver --port 8080 --workitems 10000 --latency 0.02
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+COLLECTION = "DefaultCollection"
+
+
+def _load(path):
+    with open(os.path.join(RESOURCES, path), mode="r", encoding="utf-8-sig") as f:
+        return json.load(f)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients close keep-alive connections and skip unread responses
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockTFSServer:
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        workitems=0,
+        changesets=0,
+        file_size=1024 * 1024,
+        latency=0.0,
+        jitter=0.0,
+        throttle_every=0,
+        retry_after=1,
+        error_rate=0.0,
+        error_status=500,
+        api_version="1.0",
+        seed=0,
+    ):
+        """
+        TFS server on localhost with synthesized data, use it as context manager
+        or call :meth:`start` and :meth:`stop`
+
+        :param port: 0 to use any free port, see :attr:`url`
+        :param workitems: number of work items with ids from 1, 0 to serve only files of resources
+        :param changesets: number of changesets with ids from 1, 0 to serve only files of resources
+        :param file_size: size of each attachment, bytes
+        :param latency: delay before each response, seconds
+        :param jitter: max random delay added to the latency, seconds
+        :param throttle_every: every n-th request is answered with 429 and ``Retry-After``, 0 to disable
+        :param retry_after: value of ``Retry-After`` header of throttled responses, seconds
+        :param error_rate: part of requests answered with server error, e.g. 0.01 for 1%
+        :param error_status: status of the server errors, e.g. 503 which is retried
+            by :class:`AdaptiveRateLimiter` like throttling, 500 which is not
+        :param api_version: API version sent in ``Content-Type`` of responses
+        :param seed: seed of random delays and errors
+        """
+        self.workitems = workitems
+        self.changesets = changesets
+        self.file_size = file_size
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api_version = api_version
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._workitem = _load("_apis/wit/workitems/response.json")["value"][0]
+        self._changeset = _load("_apis/tfvc/changesets/response.json")["value"][0]
+        self.file_content = bytes(range(256)) * (-(-file_size // 256))
+
+        handler = type("Handler", (MockTFSRequestHandler,), {"mock": self})
+        self._server = _HTTPServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        """Server url to pass to :class:`TFSAPI`"""
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/tfs".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def fault(self):
+        """Injected fault of the next request: None, 429 or :attr:`error_status`"""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            if (
+                self.throttle_every
+                and self.stats["requests"] % self.throttle_every == 0
+            ):
+                self.stats["throttled"] += 1
+                status = 429
+            elif self.error_rate and self._random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                status = self.error_status
+            else:
+                status = None
+        if delay:
+            time.sleep(delay)
+        return status
+
+    def url_of(self, path):
+        return "{}/{}/{}".format(self.url, COLLECTION, path)
+
+    def workitem(self, id_, fields=None):
+        workitem = deepcopy(self._workitem)
+        workitem["id"] = id_
+        workitem["url"] = self.url_of("_apis/wit/workItems/{}".format(id_))
+        workitem["fields"]["System.Id"] = id_
+        workitem["fields"]["System.Title"] = "Work item {}".format(id_)
+        relations = [
+            {
+                "rel": "AttachedFile",
+                "url": self.url_of("_apis/wit/attachments/{}".format(id_)),
+                "attributes": {"name": "{}.bin".format(id_)},
+            }
+        ]
+        if id_ > 1:
+            relations.append(
+                {
+                    "rel": "System.LinkTypes.Hierarchy-Reverse",
+                    "url": self.url_of("_apis/wit/workItems/{}".format(id_ // 2)),
+                    "attributes": {"isLocked": False},
+                }
+            )
+        workitem["relations"] = relations
+        if fields:
+            names = {x.lower() for x in fields}
+            workitem["fields"] = {
+                name: value
+                for name, value in workitem["fields"].items()
+                if name.lower() in names
+            }
+            del workitem["relations"]
+        return workitem
+
+    def workitems_response(self, ids, fields=None):
+        ids = [x for x in ids if 1 <= x <= self.workitems]
+        value = [self.workitem(x, fields) for x in ids]
+        return {"count": len(value), "value": value}
+
+    def wiql_response(self):
+        ids = range(1, self.workitems + 1)
+        return {
+            "queryType": "flat",
+            "queryResultType": "workItem",
+            "asOf": "2015-10-20T12:54:31.22Z",
+            "columns": [
+                {
+                    "referenceName": "System.Id",
+                    "name": "ID",
+                    "url": self.url_of("_apis/wit/fields/System.Id"),
+                }
+            ],
+            "workItems": [
+                {"id": x, "url": self.url_of("_apis/wit/workItems/{}".format(x))}
+                for x in ids
+            ],
+        }
+
+    def changesets_response(self, top, skip):
+        value = []
+        for id_ in range(skip + 1, min(skip + top, self.changesets) + 1):
+            changeset = deepcopy(self._changeset)
+            changeset["changesetId"] = id_
+            changeset["url"] = self.url_of("_apis/tfvc/changesets/{}".format(id_))
+            value.append(changeset)
+        return {"count": len(value), "value": value}
+
+    def file_range(self, range_):
+        """Content of attachment and status for value of ``Range`` header"""
+        if range_ is None:
+            return 200, 0, self.file_size
+        start, end = range_.split("=")[1].split("-")
+        end = int(end) + 1 if end else self.file_size
+        return 206, int(start), min(end, self.file_size)
+
+
+class MockTFSRequestHandler(BaseHTTPRequestHandler):
+    """Handler of :class:`MockTFSServer`, which is set as ``mock`` attribute of the subclass"""
+
+    protocol_version = "HTTP/1.1"
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        status = self.mock.fault()
+        if status == 429:
+            return self.send_json(
+                429,
+                {"message": "Request was blocked due to exceeding usage"},
+                {"Retry-After": str(self.mock.retry_after)},
+            )
+        if status is not None:
+            return self.send_json(status, {"message": "Injected server error"})
+
+        url = urlparse(self.path)
+        path = url.path.split(COLLECTION + "/", 1)[-1]
+        query = parse_qs(url.query)
+        mock = self.mock
+
+        if mock.workitems and path.lower().endswith("_apis/wit/workitems"):
+            ids = [int(x) for x in query["ids"][0].split(",")]
+            fields = query["fields"][0].split(",") if "fields" in query else None
+            return self.send_json(200, mock.workitems_response(ids, fields))
+        if mock.workitems and path.lower().endswith("_apis/wit/workitemsbatch"):
+            data = json.loads(body)
+            return self.send_json(
+                200, mock.workitems_response(data["ids"], data.get("fields"))
+            )
+        if mock.workitems and path.endswith("_apis/wit/wiql"):
+            return self.send_json(200, mock.wiql_response())
+        if mock.changesets and path.endswith("_apis/tfvc/changesets"):
+            top = int(query.get("$top", ["100"])[0])
+            skip = int(query.get("$skip", ["0"])[0])
+            return self.send_json(200, mock.changesets_response(top, skip))
+        if path.startswith("_apis/wit/attachments/"):
+            return self.send_file()
+        return self.send_resource(path)
+
+    do_POST = do_PUT = do_PATCH = do_GET
+
+    def send_json(self, status, data, headers=None):
+        self.send_body(
+            status,
+            json.dumps(data).encode("utf-8"),
+            "application/json; charset=utf-8; api-version={}".format(
+                self.mock.api_version
+            ),
+            headers,
+        )
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_resource(self, path):
+        response_file = os.path.join(
+            os.path.normpath(os.path.join(RESOURCES, path)), "response.json"
+        )
+        if not os.path.exists(response_file):
+            message = "Cannot find file {}".format(response_file)
+            return self.send_body(404, message.encode("utf-8"), "text/plain")
+        with open(response_file, mode="rb") as f:
+            body = f.read()
+        self.send_body(
+            200,
+            body,
+            "application/json; charset=utf-8; api-version={}".format(
+                self.mock.api_version
+            ),
+        )
+
+    def send_file(self):
+        status, start, end = self.mock.file_range(self.headers.get("Range"))
+        headers = {"Accept-Ranges": "bytes"}
+        if status == 206:
+            headers["Content-Range"] = "bytes {}-{}/{}".format(
+                start, end - 1, self.mock.file_size
+            )
+        self.send_body(
+            status,
+            self.mock.file_content[start:end],
+            "application/octet-stream",
+            headers,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workitems", type=int, default=10000)
+    parser.add_argument("--changesets", type=int, default=10000)
+    parser.add_argument("--file-size", type=int, default=16 * 1024 * 1024)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--api-version", default="1.0")
+    args = parser.parse_args()
+
+    server = MockTFSServer(**{k: v for k, v in vars(args).items()})
+    print("Serving {}/{}".format(server.url, COLLECTION))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from requests.auth import HTTPDigestAuth
+from requests_ntlm import HttpNtlmAuth
+
+from tfs import AsyncTFSAPI
+from tfs import Run
+from tfs import TFSClientError
+from tfs import Wiql
+from tfs import Workitem
+
+pytest.importorskip("aiohttp")
+
+
+@pytest.fixture()
+def run(tfs_server):
+    def run_(coroutine_function):
+        async def main():
+            async with AsyncTFSAPI(
+                tfs_server, "DefaultCollection/MyProject", "username", "password"
+            ) as client:
+                return await coroutine_function(client)
+
+        return asyncio.run(main())
+
+    yield run_
+
+
+class TestAsyncTFSAPI:
+    def test_get_workitems(self, run):
+        async def main(client):
+            return await client.get_workitems([100, 101])
+
+        workitems = run(main)
+
+        assert len(workitems) == 2
+        assert isinstance(workitems[0], Workitem)
+        assert workitems[0].id == 100
+        assert workitems[1]["Title"]
+
+    def test_get_workitems_gather(self, run):
+        async def main(client):
+            return await asyncio.gather(
+                client.get_workitem(100), client.get_workitems([100, 101])
+            )
+
+        workitem, workitems = run(main)
+
+        assert workitem.id == 100
+        assert len(workitems) == 2
+
+    def test_run_wiql(self, run):
+        async def main(client):
+            return await client.run_wiql("SELECT *")
+
+        wiql = run(main)
+
+        assert isinstance(wiql, Wiql)
+        assert wiql.workitem_ids == [100, 101]
+
+    def test_get_changesets(self, run):
+        async def main(client):
+            return await client.get_changesets(from_=10, to_=14)
+
+        changesets = run(main)
+
+        assert len(changesets) == 5
+        assert changesets[0].id == 10
+
+    def test_runs_and_results(self, run):
+        async def main(client):
+            return await asyncio.gather(client.runs(top=39), client.results(1))
+
+        runs, results = run(main)
+
+        assert len(runs) == 4
+        assert isinstance(runs[0], Run)
+        assert results[0].outcome == "Passed"
+
+    def test_download_file(self, run, tmpdir):
+        filename = str(tmpdir.join("projects.json"))
+
+        async def main(client):
+            await client.download_file("projects", filename)
+
+        run(main)
+
+        with open(filename, encoding="utf-8-sig") as file:
+            assert "ProjectName" in file.read()
+
+    @pytest.mark.filterwarnings("error::RuntimeWarning")
+    def test_resources_without_requests(self, run):
+        async def main(client):
+            return await asyncio.gather(
+                client.get_workitem(100), client.run_wiql("SELECT *")
+            )
+
+        workitem, wiql = run(main)
+        url = workitem.url.rsplit("/", 1)[0]
+        workitem.data["_links"] = {"workItemHistory": {"href": url + "/100/history"}}
+        workitem.data["relations"] = [
+            {
+                "rel": "System.LinkTypes.Hierarchy-Reverse",
+                "url": url + "/5",
+                "attributes": {},
+            },
+            {
+                "rel": "AttachedFile",
+                "url": url.replace("workItems", "attachments/1"),
+                "attributes": {"name": "file.txt"},
+            },
+        ]
+        workitem = Workitem(workitem.tfs, workitem.data)
+
+        assert workitem["Title"]
+        assert workitem.parent_id == 5
+        assert wiql.workitem_ids == [100, 101]
+        with pytest.raises(TFSClientError, match="update_workitem"):
+            workitem["Title"] = "New"
+        with pytest.raises(TFSClientError, match="get_workitem"):
+            workitem.parent
+        with pytest.raises(TFSClientError, match="get_tfs_resource"):
+            workitem.workItemHistory
+        with pytest.raises(TFSClientError, match="download_file"):
+            workitem.attachments[0].download("file")
+        with pytest.raises(TFSClientError, match="get_workitems"):
+            wiql.workitems
+        assert not hasattr(workitem, "parent")
+        assert not hasattr(workitem.tfs, "get_workitem")
+        assert getattr(workitem.tfs, "get_workitem", None) is None
+
+    @pytest.mark.parametrize("auth_type", [HTTPDigestAuth, HttpNtlmAuth])
+    def test_auth_type(self, auth_type):
+        with pytest.raises(ValueError, match=auth_type.__name__):
+            AsyncTFSAPI(
+                "http://tfs.tfs.ru/tfs",
+                user="user",
+                password="pass",
+                auth_type=auth_type,
+            )
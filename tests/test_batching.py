@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import re
+
+import httpretty
+import pytest
+
+from tests import conftest
+from tfs import AdaptiveBatchSize
+
+
+class TestAdaptiveBatchSize:
+    def test_grow(self):
+        sizer = AdaptiveBatchSize(initial=50, max_size=200)
+
+        sizer.success(50, 0.1, 10000)
+        assert sizer.size == 100
+        sizer.success(100, 0.1, 10000)
+        sizer.success(200, 0.1, 10000)
+        assert sizer.size == 200
+
+    def test_keep(self):
+        sizer = AdaptiveBatchSize(initial=50, target_seconds=2)
+
+        sizer.success(50, 1.5, 10000)
+        assert sizer.size == 50
+
+    def test_shrink_slow(self):
+        sizer = AdaptiveBatchSize(initial=100, target_seconds=2)
+
+        sizer.success(100, 8, 10000)
+        assert sizer.size == 25
+
+    def test_shrink_large(self):
+        sizer = AdaptiveBatchSize(initial=100, max_bytes=1000)
+
+        sizer.success(100, 0.1, 4000)
+        assert sizer.size == 25
+
+    def test_failure(self):
+        sizer = AdaptiveBatchSize(initial=100, min_size=10)
+
+        sizer.failure(100)
+        assert sizer.size == 50
+        sizer.failure(12)
+        assert sizer.size == 10
+
+    def test_limit(self):
+        sizer = AdaptiveBatchSize(initial=50, max_query_length=60)
+        ids = list(range(1000, 1100))
+
+        assert sizer.limit(ids) == 50
+        assert sizer.limit(ids[:10]) == 10
+        # "ids=" and 11 ids of 4 digits separated with comma
+        assert sizer.limit(ids, query_length=4) == 11
+
+    def test_stats(self):
+        sizer = AdaptiveBatchSize(initial=50)
+        sizer.success(50, 0.1, 100)
+        sizer.failure(100)
+
+        assert sizer.stats() == {
+            "size": 50,
+            "requests": 1,
+            "failures": 1,
+            "sizes": [50],
+        }
+
+
+class TestTFSAPIAdaptiveBatchSize:
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("max_workers", [None, 3])
+    def test_get_workitems_auto(self, tfsapi, max_workers):
+        def callback(request, uri, headers):
+            if len(request.querystring["ids"][0].split(",")) > 30:
+                return 414, headers, "URI Too Long"
+            return conftest.request_callback_workitems(request, uri, headers)
+
+        httpretty.reset()
+        # Server without wit/workitemsbatch
+        tfsapi.workitemsbatch = False
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems$"),
+            body=callback,
+        )
+        ids = list(range(1000, 1200))
+
+        workitems = tfsapi.get_workitems(
+            ids, fields=["System.Title"], batch_size="auto", max_workers=max_workers
+        )
+
+        assert [x.id for x in workitems] == ids
+        stats = tfsapi.batch_size_stats()[(("System.Title",), "all")]
+        assert stats["failures"] > 0
+        assert max(stats["sizes"]) <= 30
+        assert sum(stats["sizes"]) == len(ids)
+
+    @pytest.mark.httpretty
+    def test_iter_workitems_auto(self, tfsapi):
+        httpretty.reset()
+        # Server without wit/workitemsbatch
+        tfsapi.workitemsbatch = False
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems$"),
+            body=conftest.request_callback_workitems,
+        )
+        sizer = AdaptiveBatchSize(initial=10, max_size=40)
+        ids = list(range(1000, 1100))
+
+        workitems = tfsapi.iter_workitems(ids, batch_size=sizer, prefetch=0)
+
+        assert [x.id for x in workitems] == ids
+        assert sizer.stats()["sizes"] == [10, 20, 40, 30]
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+
+import httpretty
+import pytest
+
+from tests import conftest
+from tfs import FileCache
+from tfs import MemoryCache
+from tfs import SQLiteCache
+from tfs import TFSAPI
+from tfs.cache import CacheEntry
+from tfs.cache import changes_resources
+
+
+def request_callback_etag(request, uri, headers):
+    if request.headers.get("If-None-Match") == '"v1"':
+        return 304, headers, ""
+    code, headers, response = conftest.request_callback_get(request, uri, headers)
+    headers["ETag"] = '"v1"'
+    return code, headers, response
+
+
+class BareNotModifiedHandler(BaseHTTPRequestHandler):
+    """Projects with ETag, 304 without Content-Type like real servers send it"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        with open("tests/resources/_apis/projects/response.json", "rb") as file:
+            body = file.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; api-version=1.0")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def bare_etag_server():
+    server = HTTPServer(("127.0.0.1", 0), BareNotModifiedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}/tfs".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def etag_server():
+    httpretty.reset()
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"http://.*/DefaultCollection/.*"),
+        body=request_callback_etag,
+    )
+
+
+class TestMemoryCache:
+    def test_lru(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set("a", CacheEntry("1", None, {}))
+        cache.set("b", CacheEntry("2", None, {}))
+        cache.get("a")
+        cache.set("c", CacheEntry("3", None, {}))
+
+        assert cache.get("b") is None
+        assert cache.get("a").etag == "1"
+        assert cache.get("c").etag == "3"
+
+    def test_body_is_copied(self):
+        cache = MemoryCache()
+        body = {"value": [{"id": 1}]}
+        cache.set("a", CacheEntry("1", None, body))
+        body["value"].append({"id": 2})
+
+        assert cache.get("a").body == {"value": [{"id": 1}]}
+
+
+class TestFileCache:
+    def test_set_get_delete(self, tmpdir):
+        cache = FileCache(str(tmpdir))
+        cache.set("http://tfs/_apis/projects", CacheEntry('"1"', None, {"a": [1]}))
+
+        assert FileCache(str(tmpdir)).get("http://tfs/_apis/projects") == CacheEntry(
+            '"1"', None, {"a": [1]}
+        )
+        cache.delete("http://tfs/_apis/projects")
+        assert cache.get("http://tfs/_apis/projects") is None
+
+    def test_keys_index(self, tmpdir, monkeypatch):
+        FileCache(str(tmpdir)).set(
+            "http://tfs/_apis/projects", CacheEntry(None, None, {})
+        )
+        cache = FileCache(str(tmpdir))
+        cache.set("http://tfs/_apis/wit/workitems/1", CacheEntry(None, None, {}))
+        loaded = []
+        load = FileCache._load
+        monkeypatch.setattr(
+            FileCache,
+            "_load",
+            staticmethod(lambda path: loaded.append(path) or load(path)),
+        )
+
+        for _ in range(3):
+            assert sorted(cache.keys()) == [
+                "http://tfs/_apis/projects",
+                "http://tfs/_apis/wit/workitems/1",
+            ]
+        cache.invalidate("http://tfs/_apis/wit/workitems/1")
+
+        # Only the file written by another instance is read
+        assert len(loaded) == 1
+        assert cache.keys() == ["http://tfs/_apis/projects"]
+
+
+class TestSQLiteCache:
+    def test_set_get_persistent(self, tmpdir):
+        filename = str(tmpdir.join("cache.sqlite"))
+        cache = SQLiteCache(filename)
+        cache.set("http://tfs/_apis/projects", CacheEntry('"1"', None, {"a": [1]}, 1.0))
+        cache.close()
+
+        assert SQLiteCache(filename).get("http://tfs/_apis/projects") == CacheEntry(
+            '"1"', None, {"a": [1]}, 1.0
+        )
+
+    def test_invalidate(self, tmpdir):
+        cache = SQLiteCache(str(tmpdir.join("cache.sqlite")))
+        for key in (
+            "http://tfs/C/_apis/wit/workitems?ids=1,2&api-version=1.0",
+            "http://tfs/C/_apis/wit/workItems/2/revisions",
+            "http://tfs/C/_apis/wit/workitemtypes",
+            "http://tfs/C/_apis/projects",
+        ):
+            cache.set(key, CacheEntry(None, None, {}))
+        cache.invalidate("http://tfs/C/P/_apis/wit/workitems/$Task?api-version=1.0")
+
+        assert sorted(cache.keys()) == [
+            "http://tfs/C/_apis/projects",
+            "http://tfs/C/_apis/wit/workitemtypes",
+        ]
+
+
+@pytest.mark.parametrize(
+    "method, url, changes",
+    [
+        ("GET", "http://tfs/C/_apis/wit/workitems/1", False),
+        ("OPTIONS", "http://tfs/C/_apis", False),
+        ("POST", "http://tfs/C/P/_apis/wit/wiql?api-version=1.0", False),
+        ("POST", "http://tfs/C/_apis/wit/workitemsbatch?api-version=5.0", False),
+        ("POST", "http://tfs/C/_apis/wit/$batch", True),
+        ("POST", "http://tfs/C/P/_apis/wit/workitems/$Task", True),
+        ("PATCH", "http://tfs/C/_apis/wit/workitems/1", True),
+        ("PUT", "http://tfs/C/_apis/build/definitions/1", True),
+        ("DELETE", "http://tfs/C/_apis/wit/workitems/1", True),
+    ],
+)
+def test_changes_resources(method, url, changes):
+    assert changes_resources(method, url) is changes
+
+
+class TestTTL:
+    def test_ttl_by_prefix(self):
+        cache = MemoryCache(ttl=10, ttls={"wit/workitems": 0, "wit": 60})
+
+        assert cache.ttl_for("http://tfs/C/_apis/projects") == 10
+        assert cache.ttl_for("http://tfs/C/_apis/wit/workItems/1") == 0
+        assert cache.ttl_for("http://tfs/C/P/_apis/wit/queries/1") == 60
+
+    @pytest.mark.httpretty
+    def test_fresh_response_without_request(self, etag_server, tmpdir):
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            "username",
+            "password",
+            cache=SQLiteCache(str(tmpdir.join("cache.sqlite")), ttls={"projects": 60}),
+        )
+
+        client.projects
+        projects = client.projects
+
+        assert len(httpretty.latest_requests()) == 1
+        assert projects[0]["name"] == "ProjectName"
+
+    @pytest.mark.httpretty
+    def test_invalidate_on_update(self, tmpdir):
+        cache = MemoryCache(ttl=60)
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            "username",
+            "password",
+            cache=cache,
+        )
+
+        client.get_workitems([100, 101])
+        client.get_workitems([100, 101])
+        client.update_workitem(100, [])
+        client.get_workitems([100, 101])
+
+        methods = [request.method for request in httpretty.latest_requests()]
+        assert methods.count("GET") == 2
+
+    @pytest.mark.httpretty
+    def test_no_invalidate_on_read(self):
+        invalidated = []
+
+        class Cache(MemoryCache):
+            def invalidate(self, url):
+                invalidated.append(url)
+                super().invalidate(url)
+
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            "username",
+            "password",
+            cache=Cache(ttl=60),
+        )
+
+        client.get_workitems([100, 101])
+        client.run_wiql("SELECT [System.Id] FROM workitems")
+        client.update_workitem(100, [])
+
+        assert len(invalidated) == 1
+        assert "workitems/100" in invalidated[0]
+
+
+class TestConditionalRequests:
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("backend", ["memory", "file"])
+    def test_not_modified(self, etag_server, backend, tmpdir):
+        cache = MemoryCache() if backend == "memory" else FileCache(str(tmpdir))
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            "username",
+            "password",
+            cache=cache,
+        )
+
+        projects = client.projects
+        projects[0].data["name"] = "Changed"
+        cached_projects = client.projects
+
+        assert httpretty.last_request().headers["If-None-Match"] == '"v1"'
+        assert len(httpretty.latest_requests()) == 2
+        assert cached_projects[0]["name"] == "ProjectName"
+
+    @pytest.mark.httpretty
+    def test_without_cache(self, etag_server, tfsapi):
+        tfsapi.projects
+        tfsapi.projects
+
+        assert "If-None-Match" not in httpretty.last_request().headers
+
+    @pytest.mark.parametrize("backend", ["file", "sqlite"])
+    def test_not_modified_without_content_type(self, bare_etag_server, backend, tmpdir):
+        def client():
+            if backend == "file":
+                cache = FileCache(str(tmpdir))
+            else:
+                cache = SQLiteCache(str(tmpdir.join("cache.sqlite")))
+            return TFSAPI(
+                bare_etag_server, "DefaultCollection", pat="token", cache=cache
+            )
+
+        client().projects
+        # A new client has no API version yet and gets the bare 304
+        projects = client().projects
+
+        assert projects[0]["name"] == "ProjectName"
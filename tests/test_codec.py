@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import json
+
+import httpretty
+import pytest
+
+from tfs import JSONCodec
+from tfs import TFSAPI
+from tfs.codec import CODEC_NAMES
+from tfs.codec import get_codec
+
+
+def installed_codecs():
+    names = []
+    for name in CODEC_NAMES:
+        try:
+            get_codec(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+class TestCodec:
+    @pytest.mark.parametrize("name", installed_codecs())
+    def test_round_trip(self, name):
+        codec = get_codec(name)
+        value = {"id": 100, "fields": {"System.Title": "Задача / 1"}, "rev": None}
+
+        assert codec.name == name
+        assert codec.loads(codec.dumps(value)) == value
+        assert codec.loads(b"\xef\xbb\xbf" + codec.dumps(value)) == value
+
+    def test_auto(self):
+        assert get_codec().name == installed_codecs()[0]
+
+    def test_custom(self):
+        codec = JSONCodec("custom", json.loads, lambda x: json.dumps(x).encode())
+
+        assert get_codec(codec) is codec
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            get_codec("yaml")
+
+
+class TestTFSAPICodec:
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("name", installed_codecs())
+    def test_create_workitem(self, name):
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            "username",
+            "password",
+            json_codec=name,
+        )
+
+        workitem = client.create_workitem("Task", fields={"System.Title": "Задача"})
+
+        body = json.loads(httpretty.last_request().body)
+        assert client.rest_client.codec.name == name
+        assert {"op": "add", "path": "/fields/System.Title", "value": "Задача"} in body
+        assert workitem.id == 298
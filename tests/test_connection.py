@@ -1,13 +1,37 @@
 # -*- coding: utf-8 -*-
+import json
 import re
+from collections import namedtuple
 
 import httpretty
 import pytest
+import requests
 
 from tests import conftest
 from tfs import *
 
 
+FILE_CONTENT = bytes(range(256)) * 40
+
+
+def request_callback_file(drop_after=None):
+    """Serve FILE_CONTENT with ranges support. Break the first response after drop_after bytes"""
+    requests_ranges = []
+
+    def callback(request, uri, headers):
+        range_ = request.headers.get("Range")
+        requests_ranges.append(range_)
+        headers["Accept-Ranges"] = "bytes"
+        if range_ is None:
+            headers["Content-Length"] = str(len(FILE_CONTENT))
+            return 200, headers, FILE_CONTENT[:drop_after]
+        start, end = range_.split("=")[1].split("-")
+        end = int(end) + 1 if end else len(FILE_CONTENT)
+        return 206, headers, FILE_CONTENT[int(start) : end]
+
+    return callback, requests_ranges
+
+
 class TestTFSAPI:
     @httpretty.activate
     def test_get_gitrepositories_with_pat(self):
@@ -80,6 +104,387 @@ class TestTFSAPI:
         assert workitems[0].id == 100
         assert workitems[1].id == 101
 
+    @pytest.mark.httpretty
+    def test_get_workitems_max_workers(self, tfsapi):
+        httpretty.reset()
+        # Server without wit/workitemsbatch
+        tfsapi.workitemsbatch = False
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems$"),
+            body=conftest.request_callback_workitems,
+        )
+        ids = list(range(200, 230))
+
+        workitems = tfsapi.get_workitems(ids, batch_size=4, max_workers=4)
+
+        assert [x.id for x in workitems] == ids
+        assert len(httpretty.latest_requests()) == 8
+
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("prefetch", [0, 3])
+    def test_iter_workitems(self, tfsapi, prefetch):
+        httpretty.reset()
+        # Server without wit/workitemsbatch
+        tfsapi.workitemsbatch = False
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems$"),
+            body=conftest.request_callback_workitems,
+        )
+        ids = list(range(200, 230))
+
+        workitems = tfsapi.iter_workitems(ids, batch_size=4, prefetch=prefetch)
+        first = next(workitems)
+
+        assert first.id == 200
+        assert len(httpretty.latest_requests()) <= prefetch + 1
+        assert [x.id for x in workitems] == ids[1:]
+        assert len(httpretty.latest_requests()) == 8
+
+    @pytest.mark.httpretty
+    def test_get_workitems_batch_endpoint(self, tfsapi):
+        requests = []
+
+        def callback(request, uri, headers):
+            requests.append(request)
+            return conftest.request_callback_workitemsbatch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitemsbatch$"),
+            body=callback,
+        )
+        tfsapi.rest_client.api_version = "5.1"
+        ids = list(range(1000, 1450))
+
+        workitems = tfsapi.get_workitems(
+            ids, fields=["System.Title"], as_of="2024-01-01T00:00:00Z"
+        )
+
+        assert [x.id for x in workitems] == ids
+        bodies = [json.loads(x.body) for x in requests]
+        assert [len(x["ids"]) for x in bodies] == [200, 200, 50]
+        assert bodies[0]["fields"] == ["System.Title"]
+        assert bodies[0]["asOf"] == "2024-01-01T00:00:00Z"
+        assert "$expand" not in bodies[0]
+        assert requests[0].querystring["api-version"] == ["5.0"]
+
+    @pytest.mark.httpretty
+    def test_get_workitem_rows(self, tfsapi):
+        httpretty.reset()
+        # Server without wit/workitemsbatch
+        tfsapi.workitemsbatch = False
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems$"),
+            body=conftest.request_callback_workitems,
+        )
+
+        rows = tfsapi.get_workitem_rows(
+            [100, 101],
+            ["System.Title", "system.state", "Microsoft.VSTS.Common.Priority"],
+        )
+
+        assert rows[0].id == 100
+        assert rows[0].Title == tfsapi.get_workitem(100)["Title"]
+        assert [x.state for x in rows] == ["Active", "New"]
+        assert rows[0].Microsoft_VSTS_Common_Priority == 2
+        assert rows[1].Microsoft_VSTS_Common_Priority is None
+        query = httpretty.latest_requests()[0].querystring
+        assert query["fields"] == [
+            "System.Title,system.state,Microsoft.VSTS.Common.Priority"
+        ]
+        assert "$expand" not in query
+
+    @pytest.mark.httpretty
+    def test_get_workitem_rows_batch_endpoint(self, tfsapi):
+        Row = namedtuple("Row", ["id", "title"])
+        requests = []
+
+        def callback(request, uri, headers):
+            requests.append(request)
+            return conftest.request_callback_workitemsbatch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitemsbatch$"),
+            body=callback,
+        )
+        tfsapi.rest_client.api_version = "5.0"
+        ids = list(range(1000, 1250))
+
+        rows = tfsapi.get_workitem_rows(
+            ids, ["System.Title"], row_class=Row, max_workers=1
+        )
+
+        assert [x.id for x in rows] == ids
+        assert isinstance(rows[0], Row)
+        bodies = [json.loads(x.body) for x in requests]
+        assert [len(x["ids"]) for x in bodies] == [200, 50]
+        assert bodies[0]["fields"] == ["System.Title"]
+        assert "$expand" not in bodies[0]
+
+    def test_get_workitem_rows_without_fields(self, tfsapi):
+        with pytest.raises(ValueError):
+            tfsapi.get_workitem_rows([100], [])
+
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize(
+        "api_version, supported",
+        [(None, None), ("1.0", None), ("3.0-preview.1", None), ("5.0", True)],
+    )
+    def test_workitemsbatch_supported(self, tfsapi, api_version, supported):
+        tfsapi.rest_client.api_version = api_version
+
+        assert tfsapi.workitemsbatch_supported() is supported
+
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("status", [200, 400, 404])
+    def test_workitemsbatch_detected(self, tfsapi, status):
+        sent = []
+
+        def callback(request, uri, headers):
+            sent.append((request.method, request.path.split("?")[0]))
+            if request.method == "GET":
+                return conftest.request_callback_workitems(request, uri, headers)
+            if status != 200:
+                return status, headers, json.dumps({"message": "Not supported"})
+            # The server returns the requested version
+            return conftest.request_callback_workitemsbatch(request, uri, headers)
+
+        httpretty.reset()
+        for method in (httpretty.GET, httpretty.POST):
+            httpretty.register_uri(
+                method,
+                re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems(batch)?$"),
+                body=callback,
+            )
+
+        assert tfsapi.workitemsbatch_supported() is None
+        tfsapi.get_workitems([100, 101])
+        workitems = tfsapi.get_workitems([100, 101])
+
+        assert [x.id for x in workitems] == [100, 101]
+        assert tfsapi.workitemsbatch_supported() is (status == 200)
+        batch = ("POST", "/tfs/DefaultCollection/_apis/wit/workitemsbatch")
+        get = ("GET", "/tfs/DefaultCollection/_apis/wit/workitems")
+        assert sent == ([batch] * 2 if status == 200 else [batch, get, get])
+
+    @pytest.mark.httpretty
+    def test_workitemsbatch_invalid_request(self, tfsapi):
+        httpretty.reset()
+        for method in (httpretty.GET, httpretty.POST):
+            httpretty.register_uri(
+                method,
+                re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems(batch)?$"),
+                status=400,
+                body=json.dumps({"message": "Unknown field"}),
+            )
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            tfsapi.get_workitems([100], fields=["Unknown"])
+
+        # Both requests failed, the support is still unknown
+        assert tfsapi.workitemsbatch_supported() is None
+
+    @pytest.mark.parametrize(
+        "kwargs, used",
+        [
+            ({}, True),
+            ({"cache": MemoryCache()}, False),
+            ({"coalesce_requests": True}, False),
+            ({"cache": MemoryCache(), "workitemsbatch": True}, True),
+            ({"workitemsbatch": False}, False),
+        ],
+    )
+    def test_workitemsbatch_used(self, kwargs, used):
+        client = TFSAPI("http://tfs.tfs.ru/tfs", pat="token", **kwargs)
+        client.rest_client.api_version = "5.0"
+
+        assert client.workitemsbatch_used() is used
+
+    @pytest.mark.httpretty
+    def test_get_workitems_cached_with_new_api(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/workitems$"),
+            body=conftest.request_callback_workitems,
+        )
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            pat="token",
+            cache=MemoryCache(ttl=60),
+        )
+        client.rest_client.api_version = "5.0"
+
+        client.get_workitems([100, 101])
+        workitems = client.get_workitems([100, 101])
+
+        assert [x.id for x in workitems] == [100, 101]
+        assert [x.method for x in httpretty.latest_requests()] == ["GET"]
+
+    @pytest.mark.httpretty
+    def test_pool_options(self):
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            "username",
+            "password",
+            pool_maxsize=32,
+            pool_block=True,
+        )
+        adapter = client.rest_client.http_session.get_adapter("https://tfs.tfs.ru")
+
+        assert adapter is client.rest_client.transport.adapter
+        assert adapter._pool_maxsize == 32
+        assert adapter._pool_block is True
+
+    @pytest.mark.httpretty
+    def test_pool_stats(self, tfsapi):
+        # Server without wit/workitemsbatch
+        tfsapi.workitemsbatch = False
+        tfsapi.projects
+        tfsapi.get_workitems([100, 101])
+        tfsapi.get_gitrepositories()
+
+        # httpretty answers with "Connection: close", only httpx follows it
+        created = 3 if tfsapi.rest_client.transport.name == "httpx" else 1
+        assert tfsapi.rest_client.pool_stats() == {
+            "requests": 3,
+            "connections_created": created,
+            "connections_reused": 3 - created,
+            "connections_discarded": 0,
+        }
+
+    @pytest.mark.httpretty
+    def test_get_json_learns_location(self, tfsapi):
+        tfsapi.get_tfs_resource("git/repositories")
+        repos = tfsapi.get_tfs_resource("git/repositories")
+
+        paths = [request.path for request in httpretty.latest_requests()]
+        assert paths == [
+            "/tfs/DefaultCollection/MyProject/_apis/git/repositories",
+            "/tfs/DefaultCollection/_apis/git/repositories",
+            "/tfs/DefaultCollection/_apis/git/repositories",
+        ]
+        assert repos[0].name == "AnotherRepository"
+
+    @pytest.mark.httpretty
+    def test_get_json_location_after_server_error(self, tfsapi):
+        def callback(request, uri, headers):
+            if "/MyProject/" in uri:
+                return 500, headers, json.dumps({"message": "Server error"})
+            return conftest.request_callback_get(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r"http://.*/DefaultCollection/.*"), body=callback
+        )
+
+        tfsapi.get_tfs_resource("git/repositories")
+        tfsapi.get_tfs_resource("git/repositories")
+
+        paths = [request.path for request in httpretty.latest_requests()]
+        assert (
+            paths
+            == [
+                "/tfs/DefaultCollection/MyProject/_apis/git/repositories",
+                "/tfs/DefaultCollection/_apis/git/repositories",
+            ]
+            * 2
+        )
+
+    @pytest.mark.httpretty
+    def test_get_json_full_url(self, tfsapi):
+        with pytest.raises(Exception):
+            tfsapi.get_json("http://tfs.tfs.ru/tfs/DefaultCollection/_apis/unknown/1")
+
+        assert len(httpretty.latest_requests()) == 1
+
+    @pytest.mark.httpretty
+    def test_discover_resource_locations(self, tfsapi):
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.OPTIONS,
+            "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/",
+            body=json.dumps(
+                {
+                    "count": 2,
+                    "value": [
+                        {
+                            "area": "git",
+                            "resourceName": "repositories",
+                            "routeTemplate": "_apis/{area}/{resource}/{repositoryId}",
+                        },
+                        {
+                            "area": "wit",
+                            "resourceName": "wiql",
+                            "routeTemplate": "{project}/_apis/{area}/{resource}/{id}",
+                        },
+                    ],
+                }
+            ),
+            content_type="application/json",
+        )
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/.*"),
+            body=conftest.request_callback_get,
+        )
+
+        assert tfsapi.discover_resource_locations() == 4
+        tfsapi.get_tfs_resource("git/repositories")
+        assert httpretty.last_request().path == (
+            "/tfs/DefaultCollection/_apis/git/repositories"
+        )
+        assert len(httpretty.latest_requests()) == 2
+
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize(
+        "drop_after,segments,ranges",
+        [
+            (None, 1, [None]),
+            (3072, 1, [None, "bytes=3072-10239"]),
+            (
+                None,
+                4,
+                [
+                    None,
+                    "bytes=0-2559",
+                    "bytes=2560-5119",
+                    "bytes=5120-7679",
+                    "bytes=7680-10239",
+                ],
+            ),
+        ],
+    )
+    def test_download_file(self, tfsapi, tmpdir, drop_after, segments, ranges):
+        if drop_after and tfsapi.rest_client.transport.name == "httpx":
+            pytest.skip("httpretty repeats the truncated body for httpx")
+        callback, requests_ranges = request_callback_file(drop_after)
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.GET, "http://tfs.tfs.ru/tfs/file.zip", body=callback
+        )
+        filename = str(tmpdir.join("file.zip"))
+
+        stats = tfsapi.download_file(
+            "http://tfs.tfs.ru/tfs/file.zip",
+            filename,
+            chunk_size=1024,
+            segments=segments,
+        )
+
+        with open(filename, "rb") as file:
+            assert file.read() == FILE_CONTENT
+        assert stats.bytes == len(FILE_CONTENT)
+        assert stats.bytes_per_second > 0
+        assert sorted(requests_ranges, key=str) == sorted(ranges, key=str)
+
     @pytest.mark.httpretty
     def test_get_workitem(self, tfsapi):
         workitem = tfsapi.get_workitem(100)
@@ -104,6 +509,329 @@ class TestTFSAPI:
         assert isinstance(workitem, Workitem)
         assert workitem.id == 298
 
+    @pytest.mark.httpretty
+    def test_update_workitems(self, tfsapi):
+        bodies = []
+
+        def callback(request, uri, headers):
+            body = json.loads(request.body)
+            bodies.append(body)
+            if any(x["uri"].startswith("/_apis/wit/workitems/104?") for x in body):
+                return 500, headers, json.dumps({"message": "Server error"})
+            return conftest.request_callback_wit_batch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/\$batch$"),
+            body=callback,
+        )
+        title = {"op": "add", "path": "/fields/System.Title", "value": "New"}
+        updates = {id_: [title] for id_ in range(100, 106)}
+
+        results = tfsapi.update_workitems(
+            updates,
+            params={"bypassRules": True},
+            revs={100: 1, 101: 5},
+            chunk=2,
+            # httpretty keeps the current request of a registered uri for all threads
+            max_workers=1,
+        )
+
+        assert list(results) == list(range(100, 106))
+        assert [x.ok for x in results.values()] == [
+            True,
+            False,
+            True,
+            True,
+            False,
+            False,
+        ]
+        assert results[100].result["fields"]["System.Title"] == "New"
+        assert results[101].status == 412
+        assert results[101].error == "Revision mismatch"
+        assert results[104].status == 500
+        assert len(bodies) == 3
+        bodies.sort(key=lambda x: x[0]["uri"])
+        assert (
+            bodies[0][0]["uri"]
+            == "/_apis/wit/workitems/100?api-version=1.0&bypassRules=True"
+        )
+        assert bodies[0][1]["body"][0] == {"op": "test", "path": "/rev", "value": 5}
+
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("use_batch", [True, False])
+    def test_create_workitems(self, tfsapi, use_batch):
+        bodies = []
+
+        def callback(request, uri, headers):
+            bodies.extend(x["body"] for x in json.loads(request.body))
+            return conftest.request_callback_wit_batch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/\$batch$"),
+            body=callback,
+        )
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/MyProject/_apis/wit/workitems/.*"),
+            body=conftest.request_callback_get,
+        )
+        parent = {"rel": "System.LinkTypes.Hierarchy-Reverse", "target": 0}
+        specs = [
+            {"type": "Task", "fields": {"System.Title": "Parent"}},
+            {
+                "type": "Task",
+                "fields": {"System.Title": "Child"},
+                "relations": [parent],
+            },
+            {"type": "Task", "fields": {"System.Title": "Invalid"}},
+            {
+                "type": "Task",
+                "fields": {"System.Title": "Orphan"},
+                "relations": [dict(parent, target=2)],
+            },
+        ]
+
+        results = tfsapi.create_workitems(
+            specs, max_workers=1, chunk=2, use_batch=use_batch
+        )
+
+        # The mock of POST wit/workitems/$Task creates any work item
+        created = not use_batch
+        assert [x.ok for x in results] == [True, True, created, created]
+        assert results[1].id is not None
+        if use_batch:
+            assert results[2].status == 400
+            assert results[2].error == "Invalid title"
+            relation = results[1].result["relations"][0]
+            assert relation["url"] == results[0].result["url"]
+            assert results[3].error == "Linked work item is not created"
+            # Nothing to add to the orphan
+            assert [] not in bodies
+
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("target", [5, -1, "0", None])
+    def test_create_workitems_invalid_target(self, tfsapi, target):
+        httpretty.reset()
+        specs = [
+            {"type": "Task", "fields": {"System.Title": "Parent"}},
+            {
+                "type": "Task",
+                "relations": [{"rel": "System.LinkTypes.Related", "target": target}],
+            },
+        ]
+
+        with pytest.raises(ValueError, match=r"specs\[1\]"):
+            tfsapi.create_workitems(specs)
+
+        assert httpretty.latest_requests() == []
+
+    @pytest.mark.httpretty
+    def test_create_workitems_validate_only(self, tfsapi):
+        requests = []
+
+        def callback(request, uri, headers):
+            requests.append(request)
+            return conftest.request_callback_wit_batch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/\$batch$"),
+            body=callback,
+        )
+        specs = [
+            {"type": "Task", "fields": {"System.Title": "Task {}".format(i)}}
+            for i in range(5)
+        ]
+
+        results = tfsapi.create_workitems(specs, validate_only=True)
+
+        assert all(x.ok for x in results)
+        assert len(requests) == 1
+        uri = json.loads(requests[0].body)[0]["uri"]
+        assert (
+            uri
+            == "/MyProject/_apis/wit/workitems/$Task?api-version=1.0&validateOnly=True"
+        )
+
+    @staticmethod
+    def copy_sources(tfsapi):
+        raw = conftest.workitems_by_ids([100, 101, 102, 103])
+        url = raw[0]["url"].rsplit("/", 1)[0] + "/{}"
+        raw[0]["relations"] = [
+            {"rel": "System.LinkTypes.Hierarchy-Forward", "url": url.format(101)}
+        ]
+        raw[1]["relations"] = [
+            {
+                "rel": "System.LinkTypes.Hierarchy-Reverse",
+                "url": url.format(100),
+                "attributes": {"id": 1},
+            },
+            {"rel": "System.LinkTypes.Related", "url": url.format(999)},
+        ]
+        raw[3]["fields"]["System.Title"] = "Invalid"
+        return [Workitem(tfsapi, x) for x in raw]
+
+    @pytest.mark.httpretty
+    def test_copy_workitems(self, tfsapi):
+        bodies = []
+
+        def callback(request, uri, headers):
+            bodies.append(json.loads(request.body))
+            return conftest.request_callback_wit_batch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/\$batch$"),
+            body=callback,
+        )
+        sources = self.copy_sources(tfsapi)
+
+        results = tfsapi.copy_workitems(
+            sources,
+            with_links_and_attachments=True,
+            from_another_project=True,
+            target_area="MyProject\\Area",
+            chunk=2,
+            max_workers=1,
+        )
+
+        assert list(results) == [100, 101, 102, 103]
+        assert [x.ok for x in results.values()] == [True, True, True, False]
+        assert results[103].error == "Invalid title"
+        fields = results[102].result["fields"]
+        assert fields["System.AreaPath"] == "MyProject\\Area"
+        assert fields["System.IterationPath"].startswith("MyProject")
+        # 2 requests to create and 1 to add relations to 2 copies
+        assert len(bodies) == 3
+        links = {
+            int(x["uri"].split("?")[0].rsplit("/", 1)[1]): [
+                y["value"] for y in x["body"]
+            ]
+            for x in bodies[-1]
+        }
+        url = sources[0].url.rsplit("/", 1)[0] + "/{}"
+        # The reverse link is created by the forward one
+        assert links == {
+            results[100].id: [
+                {
+                    "rel": "System.LinkTypes.Hierarchy-Forward",
+                    "url": url.format(results[101].id),
+                }
+            ],
+            results[101].id: [
+                {"rel": "System.LinkTypes.Related", "url": url.format(999)}
+            ],
+        }
+        assert results[101].result["relations"] == links[results[101].id]
+
+    @pytest.mark.httpretty
+    def test_copy_workitems_checkpoint(self, tfsapi, tmpdir):
+        sizes = []
+        fail = [True]
+
+        def callback(request, uri, headers):
+            sizes.append(len(json.loads(request.body)))
+            # The second batch of one work item fails
+            if fail[0] and sizes[-1] == 1:
+                return 500, headers, json.dumps({"message": "Server error"})
+            return conftest.request_callback_wit_batch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/\$batch$"),
+            body=callback,
+        )
+        sources = self.copy_sources(tfsapi)[:3]
+        checkpoint = str(tmpdir.join("copy.json"))
+
+        results = tfsapi.copy_workitems(
+            sources, chunk=2, max_workers=1, checkpoint=checkpoint
+        )
+
+        assert [x.ok for x in results.values()] == [True, True, False]
+        with open(checkpoint) as file:
+            assert sorted(json.load(file)["copied"]) == ["100", "101"]
+
+        fail[0] = False
+        del sizes[:]
+        results = tfsapi.copy_workitems(
+            sources, chunk=2, max_workers=1, checkpoint=checkpoint
+        )
+
+        assert set(sizes) == {1}
+        assert [x.ok for x in results.values()] == [True, True, True]
+        assert results[100].result is None
+
+    @pytest.mark.httpretty
+    def test_copy_workitems_links_after_resume(self, tfsapi, tmpdir):
+        bodies = []
+
+        def callback(request, uri, headers):
+            bodies.append(json.loads(request.body))
+            return conftest.request_callback_wit_batch(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.POST,
+            re.compile(r"http://.*/DefaultCollection/_apis/wit/\$batch$"),
+            body=callback,
+        )
+        sources = self.copy_sources(tfsapi)[:3]
+        checkpoint = str(tmpdir.join("copy.json"))
+        title = sources[1].data["fields"]["System.Title"]
+        sources[1].data["fields"]["System.Title"] = "Invalid"
+
+        def copy():
+            del bodies[:]
+            return tfsapi.copy_workitems(
+                sources,
+                with_links_and_attachments=True,
+                chunk=10,
+                max_workers=1,
+                checkpoint=checkpoint,
+            )
+
+        results = copy()
+
+        assert [x.ok for x in results.values()] == [True, False, True]
+        # Nothing to link yet: 100 is linked only to 101, which is not copied
+        assert len(bodies) == 1
+
+        sources[1].data["fields"]["System.Title"] = title
+        results = copy()
+        links = [
+            (int(x["uri"].split("?")[0].rsplit("/", 1)[1]), y["value"])
+            for x in bodies[-1]
+            for y in x["body"]
+        ]
+        url = sources[0].url.rsplit("/", 1)[0] + "/{}"
+
+        assert [x.ok for x in results.values()] == [True, True, True]
+        assert links == [
+            (
+                results[100].id,
+                {
+                    "rel": "System.LinkTypes.Hierarchy-Forward",
+                    "url": url.format(results[101].id),
+                },
+            ),
+            (
+                results[101].id,
+                {"rel": "System.LinkTypes.Related", "url": url.format(999)},
+            ),
+        ]
+
+        # Everything is linked
+        copy()
+        assert bodies == []
+
     @pytest.mark.httpretty
     def test_get_changesets(self, tfsapi):
         changesets = tfsapi.get_changesets(from_=10, to_=14)
@@ -129,6 +857,23 @@ class TestTFSAPI:
         # assert len(changesets) == 2
         # assert changesets[0].id == 10
 
+    @pytest.mark.httpretty
+    @pytest.mark.parametrize("prefetch", [True, False])
+    def test_iter_changesets(self, tfsapi, prefetch):
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/_apis/tfvc/changesets$"),
+            body=conftest.request_callback_changesets,
+        )
+
+        changesets = tfsapi.iter_changesets(page_size=10, prefetch=prefetch)
+
+        assert not httpretty.latest_requests()
+        assert [x.id for x in changesets] == list(range(1, 24))
+        skips = [x.querystring["$skip"] for x in httpretty.latest_requests()]
+        assert skips == [["0"], ["10"], ["20"]]
+
     @pytest.mark.httpretty
     def test_get_changeset(self, tfsapi):
         changeset = tfsapi.get_changeset(10)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from tfs import RequestMetrics
+from tfs import TFSAPI
+from tfs.metrics import Histogram
+from tfs.metrics import RequestEvent
+
+
+@pytest.fixture()
+def metrics():
+    yield RequestMetrics()
+
+
+@pytest.fixture()
+def tfsapi_metrics(metrics):
+    yield TFSAPI(
+        "http://tfs.tfs.ru/tfs",
+        "DefaultCollection/MyProject",
+        "username",
+        "password",
+        instrumentation=metrics,
+    )
+
+
+class TestHistogram:
+    def test_cumulative(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        assert histogram.cumulative() == [(0.1, 2), (1, 3), (float("inf"), 4)]
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(3.65)
+
+
+class TestRequestMetrics:
+    def test_snapshot(self, metrics):
+        metrics.on_request(
+            RequestEvent("GET", "wit/workitems", 200, 100, 0, 0, 0.01, 0.2, 0.3)
+        )
+        metrics.on_request(
+            RequestEvent("GET", "wit/workitems", 404, 10, 0, 0, 0, 0.1, 0.1)
+        )
+
+        stats = metrics.snapshot()["GET wit/workitems"]
+        assert stats["count"] == 2
+        assert stats["statuses"] == {200: 1, 404: 1}
+        assert stats["bytes_in"] == 110
+        assert stats["latency"]["total"]["sum"] == pytest.approx(0.4)
+
+    @pytest.mark.httpretty
+    def test_client_requests(self, tfsapi_metrics, metrics):
+        # Server without wit/workitemsbatch
+        tfsapi_metrics.workitemsbatch = False
+        tfsapi_metrics.get_workitems([100, 101])
+        tfsapi_metrics.get_workitem(100)
+        tfsapi_metrics.run_wiql("SELECT *")
+
+        snapshot = metrics.snapshot()
+        assert sorted(snapshot) == ["GET wit/workitems", "POST wit/wiql"]
+        assert snapshot["GET wit/workitems"]["count"] == 2
+        assert snapshot["GET wit/workitems"]["statuses"] == {200: 2}
+        assert snapshot["GET wit/workitems"]["bytes_in"] > 0
+        body = tfsapi_metrics.rest_client.codec.dumps({"query": "SELECT *"})
+        assert snapshot["POST wit/wiql"]["bytes_out"] == len(body)
+
+    @pytest.mark.httpretty
+    def test_prometheus(self, tfsapi_metrics, metrics):
+        tfsapi_metrics.get_project("ProjectName")
+
+        text = metrics.to_prometheus()
+
+        labels = 'method="GET",endpoint="projects/projectname"'
+        assert "# TYPE tfs_request_duration_seconds histogram" in text
+        assert 'tfs_requests_total{%s,status="200"} 1' % labels in text
+        assert (
+            'tfs_request_duration_seconds_bucket{%s,phase="total",le="+Inf"} 1' % labels
+            in text
+        )
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+
+import pytest
+import requests
+
+from benchmarks import memory
+from benchmarks import run as benchmarks
+from tests.mockserver import MockTFSServer
+from tfs import AdaptiveRateLimiter
+from tfs import TFSAPI
+
+
+def client_for(server, **kwargs):
+    return TFSAPI(
+        server.url, "DefaultCollection/MyProject", "username", "password", **kwargs
+    )
+
+
+class TestMockTFSServer:
+    def test_workitems(self):
+        with MockTFSServer(workitems=300) as server:
+            client = client_for(server)
+
+            workitems = client.get_workitems(range(1, 301), max_workers=2)
+            wiql = client.run_wiql("SELECT [System.Id] FROM workitems")
+
+        assert [x.id for x in workitems] == list(range(1, 301))
+        assert workitems[9]["Title"] == "Work item 10"
+        assert workitems[9].parent_id == 5
+        assert len(wiql.workitem_ids) == 300
+
+    def test_workitemsbatch(self):
+        with MockTFSServer(workitems=10, api_version="5.0") as server:
+            client = client_for(server)
+            client.get_workitem(1)
+
+            workitems = client.get_workitems(range(1, 11), fields=["System.Title"])
+
+        assert client.workitemsbatch_supported()
+        assert [x.field_names for x in workitems] == [["Title"]] * 10
+
+    def test_changesets(self):
+        with MockTFSServer(changesets=250) as server:
+            client = client_for(server)
+
+            changesets = list(client.iter_changesets(page_size=100))
+
+        assert [x.id for x in changesets] == list(range(1, 251))
+        assert server.stats["requests"] == 3
+
+    def test_resources(self):
+        with MockTFSServer() as server:
+            workitem = client_for(server).get_workitem(100)
+
+        assert workitem["Title"] == "ьсрто"
+
+    def test_download_file(self, tmpdir):
+        with MockTFSServer(workitems=1, file_size=100000) as server:
+            client = client_for(server)
+            url = client.get_workitem(1).data["relations"][0]["url"]
+            path = str(tmpdir.join("attachment.bin"))
+
+            stats = client.download_file(url, path, chunk_size=4096, segments=3)
+
+        assert stats.bytes == 100000
+        with open(path, "rb") as file:
+            assert file.read() == server.file_content[:100000]
+
+    def test_throttling(self):
+        with MockTFSServer(workitems=10, throttle_every=2, retry_after=0) as server:
+            client = client_for(
+                server, rate_limiter=AdaptiveRateLimiter(rate=100.0, backoff=0.01)
+            )
+
+            workitems = client.get_workitems(range(1, 11), batch_size=2)
+
+        assert len(workitems) == 10
+        assert server.stats == {"requests": 9, "throttled": 4, "errors": 0}
+
+    def test_errors(self):
+        with MockTFSServer(workitems=10, error_rate=1.0) as server:
+            with pytest.raises(requests.exceptions.HTTPError):
+                client_for(server).get_workitem(1)
+
+        assert server.stats["errors"] == 1
+
+    def test_retried_errors(self):
+        with MockTFSServer(workitems=10, error_rate=0.5, error_status=503) as server:
+            client = client_for(
+                server,
+                rate_limiter=AdaptiveRateLimiter(
+                    rate=100.0, backoff=0.01, max_retries=20
+                ),
+            )
+
+            workitems = client.get_workitems(range(1, 11), batch_size=2)
+
+        assert len(workitems) == 10
+        assert server.stats["errors"] > 0
+
+    def test_latency(self):
+        with MockTFSServer(workitems=1, latency=0.1) as server:
+            started = time.monotonic()
+            client_for(server).get_workitem(1)
+
+        assert time.monotonic() - started >= 0.1
+
+
+class TestBenchmarks:
+    def test_run(self, tmpdir):
+        output = str(tmpdir.join("results.json"))
+
+        benchmarks.main(
+            [
+                "--repeat=1",
+                "--workitems=20",
+                "--changesets=20",
+                "--file-size=10000",
+                "--output",
+                output,
+            ]
+        )
+
+        with open(output) as file:
+            report = json.load(file)
+        assert sorted(report["results"]) == sorted(benchmarks.BENCHMARKS)
+        assert report["results"]["get_workitems"]["count"] == 20
+        assert report["results"]["download_file"]["unit"] == "bytes"
+        assert report["results"]["parse"]["requests_per_run"] == 0
+
+    def test_failed_runs(self, tmpdir):
+        output = str(tmpdir.join("results.json"))
+
+        benchmarks.main(
+            [
+                "--only=get_workitems",
+                "--repeat=2",
+                "--workitems=20",
+                "--error-rate=1",
+                "--error-status=500",
+                "--output",
+                output,
+            ]
+        )
+
+        with open(output) as file:
+            result = json.load(file)["results"]["get_workitems"]
+        assert result["failed_runs"] == 2
+        assert result["errors"][0].startswith("HTTPError")
+        assert result["median"] is None
+
+    def test_memory(self, tmpdir):
+        output = str(tmpdir.join("memory.json"))
+
+        memory.main(["--workitems=20", "--output", output])
+
+        with open(output) as file:
+            report = json.load(file)
+        assert report["results"]["eager"]["workitem_bytes"] > 0
+        assert report["results"]["lazy"]["top_level_wrapper_bytes"] > 0
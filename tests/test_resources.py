@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 import json
+import os
+import re
+from copy import deepcopy
 
 import pytest
+from requests.structures import CaseInsensitiveDict
 
 from tfs.resources import *
 
@@ -205,6 +209,93 @@ class TestWorkitem(object):
         with pytest.raises(AttributeError):
             _ = workitem.not_exist_attribute
 
+    def test_fields_index(self, workitem):
+        raw = deepcopy(workitem.data)
+        # TFS omits empty fields, work items of one response have different fields
+        del raw["fields"]["System.Title"]
+        raw["fields"]["System.Tags"] = "tag"
+        other = Workitem(None, raw)
+
+        assert isinstance(workitem.fields, CaseInsensitiveDict)
+        assert other["Tags"] == other["system.tags"] == "tag"
+        assert other["Title"] is None
+        assert workitem.get("Tags", 1) == 1
+        assert workitem["title"] == "MyTitle"
+        # Names of both are in the shared map, no index of their own
+        assert workitem.fields._lower is None
+        assert other.fields._lower is None
+        assert (
+            workitem.fields.lookup("iterationpath")
+            == "Test Agile\\Current\\Iteration 1"
+        )
+        assert workitem.fields.lookup("Custom.Bug.Type") == "Manual Test Case"
+        assert workitem.fields.lookup("Bug.Type", "default") == "default"
+        assert workitem.get("NotExist", 1) == 1
+        assert workitem["NotExist"] is None
+
+    def test_fields_mapping(self, workitem):
+        fields = workitem.fields
+        expected = CaseInsensitiveDict(workitem.data["fields"])
+
+        assert list(fields) == list(expected)
+        assert fields == expected
+        assert "system.title" in fields
+        assert "Title" not in fields
+        assert fields["SYSTEM.TITLE"] == "MyTitle"
+        assert fields.get("Title") is None
+        with pytest.raises(KeyError):
+            _ = fields["Title"]
+
+        fields["system.title"] = "New"
+        del fields["System.Russia"]
+
+        assert workitem["Title"] == "New"
+        assert workitem["SYSTEM.TITLE"] == "New"
+        assert workitem["Russia"] is None
+        assert "system.title" in list(fields)
+        assert "Russia" not in workitem.field_names
+        assert workitem.data["fields"]["System.Title"] == "MyTitle"
+        assert fields.copy() == fields
+        assert WorkitemFields([("A", 1)], b=2) == {"a": 1, "B": 2}
+
+    def test_shared_attributes(self, workitem):
+        workitem._parse_raw(workitem.data)
+        workitem._parse_raw(workitem.data)
+
+        assert workitem.raw_attrs == ("_links", "fields")
+        assert "raw_attrs" not in vars(workitem)
+        assert "_links_attrs" not in vars(workitem)
+        assert workitem._data is workitem.data
+        assert workitem._fields is workitem.fields
+
+    def test_lazy(self, workitem):
+        raw = deepcopy(workitem.data)
+        raw["nested"] = {"name": "value", "items": [{"name": "item"}, 1]}
+
+        lazy = raw2resource(raw, Workitem(None, {"id": 1}), lazy=True)
+        eager = raw2resource(raw, Workitem(None, {"id": 1}), lazy=False)
+
+        assert sorted(lazy._lazy_attrs) == ["_links", "nested", "relations"]
+        assert set(dir(lazy)) == set(dir(eager))
+        assert isinstance(lazy.relations[1], Attachment)
+        assert lazy.relations is lazy.relations
+        assert lazy.relations[1].attributes.name == ".gitignore"
+        assert lazy.nested.items[0].name == eager.nested.items[0].name
+        assert lazy.nested.items[1] == 1
+        assert lazy._links == raw["_links"]
+        assert lazy._lazy_attrs == {}
+
+    def test_lazy_delete(self, workitem):
+        lazy = raw2resource(
+            deepcopy(workitem.data), Workitem(None, {"id": 1}), lazy=True
+        )
+
+        lazy.deleteAttrs("relations")
+
+        assert "relations" not in lazy.data
+        with pytest.raises(AttributeError):
+            _ = lazy.relations
+
 
 class TestChangeset(object):
     @pytest.fixture()
@@ -320,6 +411,12 @@ class TestTFSQuery:
         assert tfsquery.workitems[0].id == 100
         assert tfsquery.workitems[1].id == 101
 
+    @pytest.mark.httpretty
+    def test_tfsquery_iter_workitems(self, tfsquery):
+        workitems = list(tfsquery.iter_workitems())
+
+        assert [x.id for x in workitems] == [100, 101]
+
 
 class TestWiql(object):
     @pytest.fixture()
@@ -443,6 +540,12 @@ class TestWiql(object):
         assert workitems[0].id == 100
         assert workitems[1].id == 101
 
+    @pytest.mark.httpretty
+    def test_get_wiql_iter_workitems(self, wiql):
+        workitems = list(wiql.iter_workitems(prefetch=0))
+
+        assert [x.id for x in workitems] == [100, 101]
+
     def test_wiql_empty(self, wiql_empty):
         assert wiql_empty.workitem_ids == []
 
@@ -450,8 +553,108 @@ class TestWiql(object):
         assert wiql._data == wiql.result
 
 
+def legacy_class_for_resource(path):
+    for resource in resource_class_map:
+        if path and re.search(resource, path, re.IGNORECASE):
+            return resource_class_map[resource]
+    return UnknownTfsObject
+
+
+def fixture_urls():
+    urls = set()
+
+    def collect(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in ("url", "href") and isinstance(item, str):
+                    urls.add(item)
+                collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+
+    for root, _, files in os.walk("tests/resources"):
+        for name in files:
+            if name.endswith(".json"):
+                with open(os.path.join(root, name), encoding="utf-8-sig") as file:
+                    collect(json.load(file))
+    return sorted(urls)
+
+
+@pytest.fixture()
+def restore_resource_class_map():
+    saved = dict(resource_class_map)
+    yield
+    resource_class_map.clear()
+    resource_class_map.update(saved)
+
+
 class TestUtilities(object):
     def test_class_for_resource_is_case_insensitive(self):
         obj = class_for_resource("bUiLd/DeFiNiTiOnS/123")
 
         assert obj is Definition
+
+    def test_class_for_resource_same_as_search(self):
+        urls = fixture_urls() + [
+            "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/wit/workItems/100/",
+            "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/wit/workItems/100?$expand=all",
+            "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/projects/Project/teams/Team",
+            "",
+        ]
+
+        assert len(urls) > 50
+        for url in urls:
+            assert class_for_resource(url) is legacy_class_for_resource(url), url
+
+    def test_class_for_resource_ids(self):
+        url = "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/test/runs/{}/results/{}"
+
+        assert class_for_resource(url.format(1, 100000)) is Result
+        assert class_for_resource(url.format(2, 100001)) is Result
+        assert class_for_resource(url.rsplit("/", 2)[0].format(3)) is Run
+
+    @pytest.mark.usefixtures("restore_resource_class_map")
+    def test_register_resource_class(self):
+        class Bug(Workitem):
+            pass
+
+        url = "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/wit/workItems/100"
+        assert class_for_resource(url) is Workitem
+
+        register_resource_class(r"wit/workItems/\d+$", Bug)
+
+        assert class_for_resource(url) is Bug
+        assert list(resource_class_map)[0] == r"wit/workItems/\d+$"
+        with pytest.raises(re.error):
+            register_resource_class(r"wit/(", Bug)
+
+    @pytest.mark.usefixtures("restore_resource_class_map")
+    @pytest.mark.parametrize(
+        "pattern, path",
+        [
+            (r"(?i)custom/x$", "Custom/X"),
+            (r"(?P<name>custom)/(?P=name)$", "custom/custom"),
+            (r"(custom)/\1$", "custom/custom"),
+        ],
+    )
+    def test_register_not_combined_pattern(self, pattern, path):
+        register_resource_class(pattern, Identity)
+        register_resource_class(r"(?P<name>other)/x$", Team)
+
+        base = "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/"
+        assert class_for_resource(base + path) is Identity
+        assert class_for_resource(base + "other/x") is Team
+        assert class_for_resource(base + "custom/y") is UnknownTfsObject
+        assert class_for_resource(base + "wit/workItems/1") is Workitem
+
+    @pytest.mark.usefixtures("restore_resource_class_map")
+    def test_resource_class_map_changed(self):
+        url = "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/wit/fields/System.Title"
+        assert class_for_resource(url) is UnknownTfsObject
+
+        resource_class_map[r"wit/fields/[^/]+$"] = Identity
+        assert class_for_resource(url) is Identity
+
+        del resource_class_map[r"wit/fields/[^/]+$"]
+        assert class_for_resource(url) is UnknownTfsObject
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpretty
+import pytest
+
+from tests import conftest
+from tfs import TFSAPI
+from tfs.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls(self):
+        single_flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def function():
+            calls.append(1)
+            release.wait()
+            return {"value": [1, 2]}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [
+                executor.submit(single_flight.do, "key", function) for _ in range(4)
+            ]
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        assert len(calls) == 1
+        assert all(result == {"value": [1, 2]} for result in results)
+        assert len({id(result) for result in results}) == 4
+        assert len({id(result["value"]) for result in results}) == 4
+
+    def test_error(self):
+        single_flight = SingleFlight()
+
+        def function():
+            raise ValueError("error")
+
+        with pytest.raises(ValueError):
+            single_flight.do("key", function)
+        assert single_flight.do("key", lambda: 1) == 1
+
+    def test_base_exception(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def function():
+            release.wait()
+            raise KeyboardInterrupt
+
+        def call():
+            try:
+                single_flight.do("key", function)
+            except BaseException as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call, daemon=True) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert not any(thread.is_alive() for thread in threads)
+        assert len(errors) == 3
+        assert all(isinstance(e, KeyboardInterrupt) for e in errors)
+        assert single_flight.do("key", lambda: 1) == 1
+
+
+class TestCoalescedRequests:
+    @pytest.mark.httpretty
+    def test_identical_gets(self):
+        def request_callback_slow(request, uri, headers):
+            time.sleep(0.2)
+            return conftest.request_callback_get(request, uri, headers)
+
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://.*/DefaultCollection/.*"),
+            body=request_callback_slow,
+        )
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection/MyProject",
+            "username",
+            "password",
+            coalesce_requests=True,
+        )
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            workitems = list(executor.map(client.get_workitem, [100] * 4))
+
+        assert len(httpretty.latest_requests()) == 1
+        assert [x.id for x in workitems] == [100] * 4
+        assert workitems[0].data is not workitems[1].data
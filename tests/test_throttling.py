@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import re
+
+import httpretty
+import pytest
+from requests.exceptions import HTTPError
+
+from tfs import AdaptiveRateLimiter
+from tfs import TFSAPI
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestAdaptiveRateLimiter:
+    def test_rate_increase(self):
+        limiter = AdaptiveRateLimiter(rate=10, max_rate=11, increase=0.5)
+
+        assert not limiter.feedback(FakeResponse())
+        assert limiter.rate == 10.5
+        limiter.feedback(FakeResponse())
+        limiter.feedback(FakeResponse())
+        assert limiter.rate == 11
+
+    def test_throttled(self):
+        limiter = AdaptiveRateLimiter(rate=10, decrease=0.5, max_retries=1)
+
+        assert limiter.feedback(FakeResponse(429, {"Retry-After": "0"}))
+        assert limiter.rate == 5
+        assert not limiter.feedback(FakeResponse(503, {"Retry-After": "0"}), 1)
+        assert limiter.stats()["throttled"] == 2
+
+    def test_retry_after_delay(self):
+        limiter = AdaptiveRateLimiter(rate=1000, jitter=0)
+        limiter.feedback(FakeResponse(429, {"Retry-After": "0.05"}))
+
+        assert limiter.acquire() == pytest.approx(0.05, abs=0.01)
+        assert limiter.last_delay == pytest.approx(0.05, abs=0.01)
+
+    def test_ratelimit_delay_slows_down(self):
+        limiter = AdaptiveRateLimiter(rate=10, decrease=0.5)
+
+        assert not limiter.feedback(FakeResponse(200, {"X-RateLimit-Delay": "0.5"}))
+        assert limiter.rate == 5
+
+    def test_rate_interval(self):
+        limiter = AdaptiveRateLimiter(rate=20)
+        limiter.acquire()
+
+        assert limiter.acquire() == pytest.approx(0.05, abs=0.01)
+
+
+class TestThrottledRequests:
+    @pytest.mark.httpretty
+    def test_retry_throttled_request(self):
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://tfs.tfs.ru/tfs/DefaultCollection/_apis/projects"),
+            responses=[
+                httpretty.Response("", status=429, adding_headers={"Retry-After": "0"}),
+                httpretty.Response(
+                    '{"count": 0, "value": []}', content_type="application/json"
+                ),
+            ],
+        )
+        limiter = AdaptiveRateLimiter(jitter=0)
+        client = TFSAPI(
+            "http://tfs.tfs.ru/tfs",
+            "DefaultCollection",
+            "username",
+            "password",
+            rate_limiter=limiter,
+        )
+
+        assert client.projects == []
+        assert limiter.stats()["requests"] == 2
+        assert limiter.stats()["throttled"] == 1
+
+    @pytest.mark.httpretty
+    def test_throttled_without_limiter(self, tfsapi):
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r"http://tfs.tfs.ru/tfs/DefaultCollection/_apis/projects"),
+            status=429,
+            body="",
+        )
+
+        with pytest.raises(HTTPError):
+            tfsapi.projects
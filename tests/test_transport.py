@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+from requests.auth import AuthBase
+from requests.auth import HTTPBasicAuth
+from requests.auth import HTTPDigestAuth
+from requests.exceptions import HTTPError
+from requests_ntlm import HttpNtlmAuth
+
+from tfs import HttpxTransport
+from tfs import TFSAPI
+
+httpx = pytest.importorskip("httpx")
+
+FILE_CONTENT = bytes(range(256)) * 40
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    """Serve FILE_CONTENT with ranges, the first response is dropped after 3072 bytes"""
+
+    protocol_version = "HTTP/1.1"
+    dropped = False
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        range_ = self.headers.get("Range")
+        start, end = 0, len(FILE_CONTENT)
+        if range_ is not None:
+            start, end = range_.split("=")[1].split("-")
+            start, end = int(start), int(end) + 1 if end else len(FILE_CONTENT)
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start))
+        self.end_headers()
+        if not FileRequestHandler.dropped:
+            FileRequestHandler.dropped = True
+            self.wfile.write(FILE_CONTENT[start : start + 3072])
+            self.close_connection = True
+        else:
+            self.wfile.write(FILE_CONTENT[start:end])
+
+
+@pytest.fixture()
+def file_server():
+    FileRequestHandler.dropped = False
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileRequestHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield "http://127.0.0.1:{}/tfs".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpxTransport:
+    def test_auth(self):
+        assert HttpxTransport._auth(None) is None
+        auth = HttpxTransport._auth(HTTPBasicAuth("user", "password"))
+        assert isinstance(auth, httpx.BasicAuth)
+        auth = HttpxTransport._auth(HTTPDigestAuth("user", "password"))
+        assert isinstance(auth, httpx.DigestAuth)
+        with pytest.raises(ValueError):
+            HttpxTransport._auth(AuthBase())
+
+    def test_ntlm_auth(self):
+        with pytest.raises(ValueError, match='NTLM.*transport="requests"'):
+            TFSAPI(
+                "http://tfs.tfs.ru/tfs",
+                "DefaultCollection",
+                "DOMAIN\\user",
+                "password",
+                auth_type=HttpNtlmAuth,
+                transport="httpx",
+            )
+
+    def test_timeout(self):
+        timeout = HttpxTransport._timeout((20, 180))
+        assert timeout.connect == 20
+        assert timeout.read == 180
+        assert HttpxTransport._timeout(None).read is None
+
+    def test_url(self):
+        url = "http://tfs.tfs.ru/tfs/DefaultCollection/_apis/wit/workitems?ids=1,2"
+        params = {"api-version": "1.0", "bypassRules": True, "validateOnly": None}
+
+        assert (
+            HttpxTransport._url(url, params)
+            == url + "&api-version=1.0&bypassRules=True"
+        )
+        assert HttpxTransport._url(url, {}) == url
+
+    def test_unknown_transport(self):
+        with pytest.raises(ValueError):
+            TFSAPI(
+                "http://tfs.tfs.ru/tfs",
+                "DefaultCollection",
+                "user",
+                "pass",
+                transport="curl",
+            )
+
+    def test_real_server(self, tfs_server):
+        client = TFSAPI(
+            tfs_server, "DefaultCollection/MyProject", "user", "pass", transport="httpx"
+        )
+
+        workitem = client.get_workitem(100)
+        with pytest.raises(HTTPError):
+            client.rest_client.send_get("unknown/resource")
+
+        assert workitem.id == 100
+        # The server doesn't support POST wit/workitemsbatch, it is detected once
+        assert client.workitemsbatch_supported() is False
+        assert client.rest_client.pool_stats()["requests"] == 3
+
+    @pytest.mark.parametrize("transport", ["requests", "httpx"])
+    def test_download_file_resume(self, file_server, tmpdir, transport):
+        client = TFSAPI(
+            file_server, "DefaultCollection", "user", "pass", transport=transport
+        )
+        filename = str(tmpdir.join("file.zip"))
+
+        stats = client.download_file(
+            file_server + "/file.zip", filename, chunk_size=1024
+        )
+
+        with open(filename, "rb") as file:
+            assert file.read() == FILE_CONTENT
+        assert stats.bytes == len(FILE_CONTENT)
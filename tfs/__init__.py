@@ -1,2 +1,4 @@
 # -*- coding: utf-8 -*-
 from tfs.connection import *  # noqa
+from tfs.aio import AsyncTFSAPI  # noqa
+from tfs.aio import AsyncTFSHTTPClient  # noqa
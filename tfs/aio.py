@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio version of the TFS API client, requires ``aiohttp``
+"""
+import asyncio
+import base64
+import ssl
+
+from requests.auth import HTTPBasicAuth
+
+from tfs.connection import batch
+from tfs.connection import TFSClientError
+from tfs.connection import TFSHTTPClient
+from tfs.resources import *  # noqa
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class _ResourcesClientError(TFSClientError, AttributeError):
+    """AttributeError too: ``hasattr`` and ``getattr`` with default work with the client"""
+
+
+class _ResourcesClient:
+    """Client of resources returned by :class:`AsyncTFSAPI`.
+    Resources can't send requests with the asyncio client: their methods and properties,
+    which send requests, raise :class:`TFSClientError` instead of returning coroutines
+    """
+
+    lazy = False
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        raise _ResourcesClientError(
+            "Resources of AsyncTFSAPI can't send requests ({}), "
+            "await methods of the client instead".format(name)
+        )
+
+
+class AsyncTFSAPI:
+    def __init__(
+        self,
+        server_url,
+        project="DefaultCollection",
+        user=None,
+        password=None,
+        pat=None,
+        verify=False,
+        connect_timeout=20,
+        read_timeout=180,
+        max_concurrency=10,
+        auth_type=HTTPBasicAuth,
+    ):
+        """
+        Asyncio counterpart of :class:`TFSAPI`. Must be closed after use,
+        e.g. ``async with AsyncTFSAPI(...) as client:``
+
+        Returned resources keep only data: their methods and properties sending requests,
+        e.g. ``workitem.parent``, ``workitem["Title"] = "New"`` or ``wiql.workitems``,
+        raise :class:`TFSClientError`. Use methods of the client, e.g.
+        ``await client.get_workitem(workitem.parent_id)``
+
+        :param server_url: url to TFS server, e.g. https://tfs.example.com/
+        :param project: Collection or Collection\\Project
+        :param user: username
+        :param password: password
+        :param pat: personal access token
+        :param verify: True|False - verify HTTPS cert
+        :param connect_timeout: CONNECTION timeout, sec or None
+        :param read_timeout: READ timeout, sec or None
+        :param max_concurrency: max number of requests sent at the same time
+        :param auth_type: only ``HTTPBasicAuth`` is supported: user and password or
+            personal access token are sent in the Basic ``Authorization`` header.
+            Other types, e.g. ``HttpNtlmAuth``, raise ValueError, use :class:`TFSAPI` with them
+        """
+        if auth_type is not HTTPBasicAuth:
+            raise ValueError(
+                "AsyncTFSAPI supports only HTTPBasicAuth (user and password or personal "
+                "access token), got {}. Use TFSAPI with other auth_type".format(
+                    getattr(auth_type, "__name__", auth_type)
+                )
+            )
+        if (user is None or password is None) and pat is None:
+            raise ValueError(
+                "User name and password or personal access token must be specified!"
+            )
+        self.rest_client = AsyncTFSHTTPClient(
+            server_url,
+            project=project,
+            user=user,
+            password=password,
+            pat=pat,
+            verify=verify,
+            timeout=(connect_timeout, read_timeout),
+            max_concurrency=max_concurrency,
+        )
+        self._resources_client = _ResourcesClient(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self.rest_client.close()
+
+    async def get_tfs_resource(self, uri, underProject=None, payload=None):
+        """Return any object in TFS by the uri"""
+        raw = await self.get_json(uri=uri, underProject=underProject, payload=payload)
+
+        # For list results
+        if "value" in raw:
+            raw = raw["value"]
+            url = raw[0].get("url", "") if raw else ""
+            tfs_class = class_for_resource(url)
+            return [
+                tfs_class(tfs=self._resources_client, raw=x, listVersion=True)
+                for x in raw
+            ]
+        else:
+            return class_for_resource(raw["url"])(
+                tfs=self._resources_client, raw=raw, listVersion=False
+            )
+
+    async def get_json(self, uri, underProject=None, payload=None):
+        """Get resource from known location or try both locations
+            (under collection and under collection/project)
+
+        :param uri: uri of he resource
+        :param underProject: base resource location selector
+        :param payload: additional query attributes
+        """
+        if underProject is not None:
+            return await self.rest_client.send_get(
+                uri, payload=payload, project=underProject
+            )
+        else:
+            try:
+                return await self.rest_client.send_get(
+                    uri, payload=payload, project=True
+                )
+            except Exception:
+                return await self.rest_client.send_get(
+                    uri, payload=payload, project=False
+                )
+
+    async def __get_workitems(self, work_items_ids, fields=None, expand="all"):
+        ids_string = ",".join(map(str, work_items_ids))
+        expand = "&$expand={}".format(expand) if expand else ""
+        fields_string = ("&fields=" + ",".join(fields)) if fields else ""
+        workitems = await self.get_tfs_resource(
+            "wit/workitems?ids={ids}{fields}{expand}&api-version=1.0".format(
+                ids=ids_string, fields=fields_string, expand=expand
+            ),
+            underProject=False,
+        )
+        return workitems
+
+    async def get_workitem(self, id_, fields=None):
+        if isinstance(id_, int):
+            return (await self.get_workitems(id_, fields))[0]
+
+    async def get_workitems(
+        self, work_items_ids, fields=None, batch_size=50, expand="all"
+    ):
+        """Get work items by ids. All batches are requested concurrently,
+        up to ``max_concurrency`` at the same time. Work items are returned in input order
+        """
+        if isinstance(work_items_ids, int):
+            work_items_ids = [work_items_ids]
+        if isinstance(work_items_ids, str):
+            work_items_ids = [work_items_ids]
+
+        batches = await asyncio.gather(
+            *(
+                self.__get_workitems(work_items_batch, fields=fields, expand=expand)
+                for work_items_batch in batch(list(work_items_ids), batch_size)
+            )
+        )
+        return [workitem for workitems in batches for workitem in workitems]
+
+    async def get_changesets(self, from_=None, to_=None, item_path=None, top=10000):
+        payload = {"$top": top}
+
+        if from_:
+            from_ = str(from_)
+            if from_.isdigit():
+                payload["searchCriteria.fromId"] = from_
+            else:
+                raise ValueError("from_ must be valid TFS changeset IDs!")
+
+        if to_:
+            to_ = str(to_)
+            if to_.isdigit():
+                payload["searchCriteria.toId"] = to_
+            else:
+                raise ValueError("to_ must be valid TFS changeset IDs!")
+
+        if item_path:
+            payload["searchCriteria.itemPath"] = item_path
+        return await self.get_tfs_resource(
+            "tfvc/changesets", underProject=False, payload=payload
+        )
+
+    async def runs(self, top=None):
+        if top is None:
+            top = 100
+        payload = {"$top": top}
+
+        return await self.get_tfs_resource(
+            "test/runs", underProject=True, payload=payload
+        )
+
+    async def results(self, runId, top=None):
+        if top is None:
+            top = 100
+        payload = {"$top": top}
+        return await self.get_tfs_resource(
+            "test/runs/{}/results".format(runId), underProject=True, payload=payload
+        )
+
+    async def update_workitem(self, work_item_id, update_data, params=None):
+        return await self.rest_client.send_patch(
+            "wit/workitems/{id}?api-version=1.0".format(id=work_item_id),
+            data=update_data,
+            headers={"Content-Type": "application/json-patch+json"},
+            payload=params,
+        )
+
+    async def run_wiql(self, query, params=None):
+        data = {
+            "query": query,
+        }
+        if params is None:
+            params = {}
+        if "api-version" not in params:
+            params["api-version"] = "1.0"
+        wiql = await self.rest_client.send_post(
+            "wit/wiql", data=data, project=True, payload=params
+        )
+        return Wiql(self._resources_client, wiql)
+
+    async def download_file(self, uri, filename, chunk_size=64 * 1024):
+        await self.rest_client.download(uri, filename, chunk_size=chunk_size)
+
+
+class AsyncTFSHTTPClient:
+    def __init__(
+        self,
+        base_url,
+        project,
+        user,
+        password,
+        pat,
+        verify=False,
+        timeout=None,
+        max_concurrency=10,
+    ):
+        if aiohttp is None:
+            raise ImportError("AsyncTFSHTTPClient requires aiohttp to be installed")
+        if not base_url.endswith("/"):
+            base_url += "/"
+
+        collection, project = TFSHTTPClient.get_collection_and_project(project)
+        self.collection = collection
+        self.project = project
+        self._url = base_url + "%s/_apis/" % collection
+        if project:
+            self._url_prj = base_url + "%s/%s/_apis/" % (collection, project)
+        else:
+            self._url_prj = self._url
+
+        # Basic authorization for both user:password and personal access token
+        credentials = ":" + pat if pat is not None else "%s:%s" % (user, password)
+        self._headers = {
+            "Authorization": "Basic "
+            + base64.b64encode(credentials.encode("utf8")).decode("ascii")
+        }
+
+        self.api_version = None
+        self.timeout = timeout
+        self._verify = verify
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self.http_session = None
+
+    def _get_session(self):
+        # Session and semaphore must be created inside of the running event loop
+        if self.http_session is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            connect_timeout, read_timeout = self.timeout or (None, None)
+            self.http_session = aiohttp.ClientSession(
+                headers=self._headers,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=connect_timeout, sock_read=read_timeout
+                ),
+            )
+        return self.http_session
+
+    async def close(self):
+        if self.http_session is not None:
+            await self.http_session.close()
+            self.http_session = None
+
+    async def send_get(self, uri, payload=None, project=False):
+        return await self.__send_request(
+            "GET", uri, None, payload=payload, underProject=project
+        )
+
+    async def send_post(self, uri, data, headers=None, payload=None, project=False):
+        return await self.__send_request(
+            "POST", uri, data, headers, payload=payload, underProject=project
+        )
+
+    async def send_put(self, uri, data, headers=None, payload=None, project=False):
+        return await self.__send_request(
+            "PUT", uri, data, headers, payload=payload, underProject=project
+        )
+
+    async def send_patch(self, uri, data, headers, payload=None, project=False):
+        return await self.__send_request(
+            "PATCH", uri, data, headers, payload=payload, underProject=project
+        )
+
+    async def download(self, uri, filename, chunk_size=64 * 1024):
+        """Write response body of the GET request to the file chunk by chunk"""
+        url = self.__prepare_uri(uri=uri, underProject=False)
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.get(url, **self._ssl_kwargs()) as response:
+                response.raise_for_status()
+                with open(filename, "wb") as file:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        file.write(chunk)
+
+    def _ssl_kwargs(self):
+        """Translate ``requests``-like verify parameter"""
+        if not self._verify:
+            return {"ssl": False}
+        if isinstance(self._verify, str):
+            return {"ssl": ssl.create_default_context(cafile=self._verify)}
+        return {}
+
+    async def __send_request(
+        self, method, uri, data, headers=None, payload=None, underProject=False
+    ):
+        """
+        Send request, see :meth:`TFSHTTPClient.__send_request`
+
+        :return: response converted to python-object
+        """
+        url = self.__prepare_uri(uri=uri, underProject=underProject)
+
+        if payload is None:
+            payload = {}
+        if self.api_version and payload.get("api-version") is None:
+            payload["api-version"] = self.api_version
+        # aiohttp accepts only str, int and float parameters
+        payload = {
+            k: str(v).lower() if isinstance(v, bool) else v
+            for k, v in payload.items()
+            if v is not None
+        }
+
+        if headers is None:
+            headers = {}
+        if headers.get("Content-Type") is None:
+            headers["Content-Type"] = "application/json"
+
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.request(
+                method,
+                url,
+                json=data,
+                headers=headers,
+                params=payload,
+                **self._ssl_kwargs()
+            ) as response:
+                response.raise_for_status()
+
+                if self.api_version is None:
+                    api_type = (
+                        response.headers.get("Content-Type", "")
+                        .split("; ")[-1]
+                        .split("=")
+                    )
+                    if api_type[0] == "api-version":
+                        self.api_version = api_type[1]
+
+                try:
+                    result = await response.json(content_type=None)
+                except ValueError:
+                    raise TFSClientError(
+                        "Response is not json: {}".format(await response.text())
+                    )
+
+                if response.status not in (200, 201, 202):
+                    raise TFSClientError(
+                        "TFS API returned HTTP %s (%s)"
+                        % (
+                            response.status,
+                            result["error"] if "error" in result else response.reason,
+                        )
+                    )
+                return result
+
+    def __prepare_uri(self, underProject, uri):
+        if uri.startswith("http"):
+            return uri
+        return (self._url_prj if underProject else self._url) + uri
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive size of batches of work items requested in one HTTP request
+"""
+import threading
+from collections import deque
+
+
+class AdaptiveBatchSize:
+    def __init__(
+        self,
+        initial=50,
+        min_size=1,
+        max_size=200,
+        target_seconds=2.0,
+        max_bytes=4 * 1024 * 1024,
+        max_query_length=2048,
+        increase=2.0,
+        decrease=0.5,
+        history=1000,
+    ):
+        """
+        Batch size which grows while responses are fast and small and shrinks
+        when they are slow, large or fail with timeout, 413 or 414 error
+
+        :param initial: size of the first batch
+        :param min_size: min number of items in a batch
+        :param max_size: max number of items in a batch, 200 is the limit of TFS
+        :param target_seconds: responses slower than this shrink the batch proportionally,
+            twice faster ones grow it
+        :param max_bytes: responses larger than this shrink the batch proportionally,
+            twice smaller ones grow it
+        :param max_query_length: max length of the query string with ids,
+            2048 is the default limit of IIS
+        :param increase: multiplier of the size after a fast and small response
+        :param decrease: multiplier of the size after a failed request
+        :param history: number of the last batch sizes kept for :meth:`stats`
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.max_query_length = max_query_length
+        self.increase = increase
+        self.decrease = decrease
+        self.size = max(min_size, min(initial, max_size))
+        self.requests = 0
+        self.failures = 0
+        self.sizes = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def limit(self, ids, query_length=None):
+        """Number of ids from the beginning of the list for the next batch
+
+        :param ids: list of ids which are not requested yet
+        :param query_length: length of the query string without ids
+            if ids are sent in the query, None if they are sent in the body
+        """
+        with self._lock:
+            size = min(self.size, len(ids))
+        if query_length is None:
+            return size
+        length = query_length
+        for count, id_ in enumerate(ids[:size]):
+            # ids are separated with comma
+            length += len(str(id_)) + (1 if count else 0)
+            if length > self.max_query_length:
+                return max(count, 1)
+        return size
+
+    def success(self, size, seconds, bytes_in):
+        """Adjust the size by the response to the batch of this size"""
+        with self._lock:
+            self.requests += 1
+            self.sizes.append(size)
+            ratio = 1.0
+            if seconds > self.target_seconds:
+                ratio = self.target_seconds / seconds
+            if bytes_in > self.max_bytes:
+                ratio = min(ratio, self.max_bytes / bytes_in)
+            if ratio < 1.0:
+                new_size = int(size * ratio)
+            elif seconds * 2 <= self.target_seconds and bytes_in * 2 <= self.max_bytes:
+                # Don't grow above the size proven by the response
+                new_size = max(self.size, int(size * self.increase))
+            else:
+                return
+            self.size = max(self.min_size, min(new_size, self.max_size))
+
+    def failure(self, size):
+        """Shrink the size after a failed request of the batch of this size"""
+        with self._lock:
+            self.failures += 1
+            self.size = max(self.min_size, min(self.size, int(size * self.decrease)))
+
+    def stats(self):
+        """
+        :return: dict with the current size, numbers of successful and failed requests
+            and sizes of the last successful batches
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "requests": self.requests,
+                "failures": self.failures,
+                "sizes": list(self.sizes),
+            }
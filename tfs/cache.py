@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of GET responses validated by ETag and Last-Modified headers
+or kept for a configured time
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+CacheEntry = namedtuple(
+    "CacheEntry", ["etag", "last_modified", "body", "created"], defaults=(None,)
+)
+
+# Last segment of the uri which identifies one resource in the collection of resources
+_ID_SEGMENT = re.compile(
+    r"^(\d+|\$.+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$",
+    re.IGNORECASE,
+)
+
+
+# POST requests which only read resources
+_READ_ONLY_POST_PATHS = ("wit/wiql", "wit/workitemsbatch")
+
+
+def copy_json(value):
+    """Copy python-object created from JSON, much faster than ``deepcopy``"""
+    if isinstance(value, dict):
+        return {k: copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_json(v) for v in value]
+    return value
+
+
+def api_path(url):
+    """Lowercase path of the url after ``_apis/``, e.g. ``wit/workitems/100``"""
+    path = urlparse(url).path.lower()
+    pos = path.find("_apis/")
+    return path[pos + len("_apis/") :] if pos > -1 else path.lstrip("/")
+
+
+def invalidation_scope(url):
+    """Path of the resources collection changed by a request to the url,
+    e.g. ``wit/workitems`` for ``wit/workitems/100`` or ``wit/workitems/$Task``
+    """
+    path = api_path(url).rstrip("/")
+    head, _, last = path.rpartition("/")
+    if head and _ID_SEGMENT.match(last):
+        return head
+    return path
+
+
+def in_scope(path, scope):
+    return path == scope or path.startswith(scope + "/")
+
+
+def changes_resources(method, url):
+    """Request can change resources, so their cached responses must be invalidated"""
+    method = method.upper()
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return False
+    if method == "POST":
+        path = api_path(url).rstrip("/")
+        return not any(in_scope(path, x) for x in _READ_ONLY_POST_PATHS)
+    return True
+
+
+class BaseCache:
+    def __init__(self, ttl=0, ttls=None):
+        """Base class of the response cache backends
+
+        Bodies of returned entries can be shared, copy them before changes
+
+        :param ttl: seconds a response is used without any request to the server,
+            after that it is validated with a conditional request. 0 - always validate
+        :param ttls: dict of ttl by API path prefix, e.g. ``{"projects": 3600, "wit/workitems": 0}``,
+            the longest matched prefix is used
+        """
+        self.ttl = ttl
+        self.ttls = sorted(
+            ((prefix.lower().strip("/"), ttl) for prefix, ttl in (ttls or {}).items()),
+            key=lambda x: len(x[0]),
+            reverse=True,
+        )
+
+    def ttl_for(self, key):
+        path = api_path(key)
+        for prefix, ttl in self.ttls:
+            if in_scope(path, prefix):
+                return ttl
+        return self.ttl
+
+    def is_fresh(self, key, entry):
+        """Entry can be used without a request to the server"""
+        ttl = self.ttl_for(key)
+        if not ttl or entry.created is None:
+            return False
+        return time.time() - entry.created < ttl
+
+    def get(self, key):
+        """
+        :param key: full url of the request with query parameters
+        :return: :class:`CacheEntry` or None
+        """
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def keys(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def invalidate(self, url):
+        """Delete responses of resources changed by a request to the url,
+        e.g. PATCH ``wit/workitems/100`` deletes all cached ``wit/workitems`` responses
+        """
+        scope = invalidation_scope(url)
+        for key in self.keys():
+            if in_scope(api_path(key), scope):
+                self.delete(key)
+
+
+class MemoryCache(BaseCache):
+    def __init__(self, maxsize=256, ttl=0, ttls=None):
+        """
+        In-memory LRU cache
+
+        :param maxsize: max number of stored responses
+        """
+        super().__init__(ttl=ttl, ttls=ttls)
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, entry):
+        # Caller keeps the original body and can change it
+        entry = entry._replace(body=copy_json(entry.body))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCache(BaseCache):
+    def __init__(self, directory, ttl=0, ttls=None):
+        """
+        Cache stored in the directory, one JSON file per response.
+        Don't share the directory between users with different permissions
+
+        :param directory: path to the directory, created if not exists
+        """
+        super().__init__(ttl=ttl, ttls=ttls)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # File name => key, so files are read only once to get their keys
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+
+    def _path(self, key):
+        return os.path.join(self.directory, self._name(key))
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        stored = self._load(self._path(key))
+        if stored is None or stored.get("key") != key:
+            return None
+        return CacheEntry(
+            stored["etag"],
+            stored["last_modified"],
+            stored["body"],
+            stored.get("created"),
+        )
+
+    def set(self, key, entry):
+        stored = dict(entry._asdict(), key=key)
+        path = self._path(key)
+        # Write to the temporary file first, so readers never get a partial file
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(stored, file)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._keys[self._name(key)] = key
+
+    def delete(self, key):
+        with self._lock:
+            self._keys.pop(self._name(key), None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        # Files can be added and removed by other processes, only new files are read
+        with self._lock:
+            known = dict(self._keys)
+        index = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            key = known.get(name)
+            if key is None:
+                stored = self._load(os.path.join(self.directory, name))
+                if stored is None:
+                    continue
+                key = stored["key"]
+            index[name] = key
+        with self._lock:
+            self._keys = index
+        return list(index.values())
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, filename, ttl=0, ttls=None):
+        """
+        Cache stored in the SQLite database, it is kept between runs of scripts.
+        Don't share the file between users with different permissions
+
+        :param filename: path to the database file, created if not exists
+        """
+        super().__init__(ttl=ttl, ttls=ttls)
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, "
+                "path TEXT, etag TEXT, last_modified TEXT, body TEXT, created REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_path ON responses (path)"
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, body, created FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body, created = row
+        return CacheEntry(etag, last_modified, json.loads(body), created)
+
+    def set(self, key, entry):
+        row = (
+            key,
+            api_path(key),
+            entry.etag,
+            entry.last_modified,
+            json.dumps(entry.body),
+            entry.created,
+        )
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", row
+            )
+
+    def delete(self, key):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def keys(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT key FROM responses")]
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    def invalidate(self, url):
+        scope = invalidation_scope(url)
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM responses WHERE path = ? OR substr(path, 1, ?) = ?",
+                (scope, len(scope) + 1, scope + "/"),
+            )
+
+    def close(self):
+        self._db.close()
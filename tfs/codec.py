@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+JSON codecs of request and response bodies: orjson, ujson or simdjson
+if installed, standard json module otherwise
+"""
+import codecs
+import json
+from collections import namedtuple
+
+JSONCodec = namedtuple("JSONCodec", ["name", "loads", "dumps"])
+JSONCodec.__doc__ = """Functions to parse JSON from ``bytes`` and serialize python-object to ``bytes``"""
+
+# Fastest first, see get_codec
+CODEC_NAMES = ("orjson", "ujson", "simdjson", "json")
+
+
+def _strip_bom(content):
+    # TFS can send UTF-8 BOM, requests' response.json() skipped it too
+    if content[:3] == codecs.BOM_UTF8:
+        return content[3:]
+    return content
+
+
+def _json_codec():
+    def dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(content):
+        return json.loads(_strip_bom(content))
+
+    return JSONCodec("json", loads, dumps)
+
+
+def _orjson_codec():
+    import orjson
+
+    def loads(content):
+        return orjson.loads(_strip_bom(content))
+
+    return JSONCodec("orjson", loads, orjson.dumps)
+
+
+def _ujson_codec():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(
+            obj, ensure_ascii=False, escape_forward_slashes=False
+        ).encode("utf-8")
+
+    def loads(content):
+        return ujson.loads(_strip_bom(content))
+
+    return JSONCodec("ujson", loads, dumps)
+
+
+def _simdjson_codec():
+    import simdjson
+
+    def dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(content):
+        return simdjson.loads(_strip_bom(content))
+
+    return JSONCodec("simdjson", loads, dumps)
+
+
+_FACTORIES = {
+    "json": _json_codec,
+    "orjson": _orjson_codec,
+    "ujson": _ujson_codec,
+    "simdjson": _simdjson_codec,
+}
+
+
+def get_codec(codec="auto"):
+    """
+    :param codec: "auto" - the fastest installed from ``CODEC_NAMES``,
+        name of the codec or :class:`JSONCodec` instance
+    :return: :class:`JSONCodec`
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec == "auto":
+        for name in CODEC_NAMES:
+            try:
+                return _FACTORIES[name]()
+            except ImportError:
+                pass
+    if codec not in _FACTORIES:
+        raise ValueError(
+            "Unknown JSON codec {}, use one of: auto, {}".format(
+                codec, ", ".join(CODEC_NAMES)
+            )
+        )
+    return _FACTORIES[codec]()
@@ -1,11 +1,108 @@
 # -*- coding: utf-8 -*-
 import base64
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import datetime
 from urllib.parse import quote
 
 import requests
 from requests.auth import HTTPBasicAuth
-
+from requests.models import PreparedRequest
+
+from tfs.batching import AdaptiveBatchSize
+from tfs.cache import CacheEntry
+from tfs.cache import changes_resources
+from tfs.cache import copy_json
+from tfs.cache import FileCache  # noqa
+from tfs.cache import MemoryCache  # noqa
+from tfs.cache import SQLiteCache  # noqa
+from tfs.codec import get_codec
+from tfs.codec import JSONCodec  # noqa
+from tfs.metrics import RequestEvent
+from tfs.metrics import RequestMetrics  # noqa
+from tfs.pool import connect_time
+from tfs.pool import reset_connect_time
 from tfs.resources import *  # noqa
+from tfs.singleflight import SingleFlight
+from tfs.throttling import AdaptiveRateLimiter  # noqa
+from tfs.transport import HttpxTransport  # noqa
+from tfs.transport import RequestsTransport  # noqa
+from tfs.transport import TRANSPORTS
+
+
+# POST wit/workitemsbatch is available since this API version
+WORKITEMSBATCH_API_VERSION = "5.0"
+WORKITEMSBATCH_MAX_IDS = 200
+
+# Max number of requests in one POST wit/$batch
+WIT_BATCH_MAX_REQUESTS = 200
+
+WorkitemResult = namedtuple("WorkitemResult", ["id", "ok", "status", "result", "error"])
+WorkitemResult.__doc__ = """Result of one work item update or creation
+in :meth:`TFSAPI.update_workitems` and :meth:`TFSAPI.create_workitems`
+
+``result`` is JSON of the work item or None, ``error`` is the error message or None.
+Status 412 means that the ``test /rev`` operation failed: the work item was changed by someone else
+"""
+
+# Fields which are not copied to a work item in another project
+NO_COPY_FIELDS = frozenset(
+    [
+        "System.TeamProject",
+        "System.AreaPath",
+        "System.IterationPath",
+        "System.Id",
+        "System.AreaId",
+        "System.NodeName",
+        "System.AreaLevel1",
+        "System.AreaLevel2",
+        "System.AreaLevel3",
+        "System.AreaLevel4",
+        "System.Rev",
+        "System.AutorizedDate",
+        "System.RevisedDate",
+        "System.IterationId",
+        "System.IterationLevel1",
+        "System.IterationLevel2",
+        "System.IterationLevel4",
+        "System.CreatedDate",
+        "System.CreatedBy",
+        "System.ChangedDate",
+        "System.ChangedBy",
+        "System.AuthorizedAs",
+        "System.AuthorizedDate",
+        "System.Watermark",
+    ]
+)
+
+DownloadStats = namedtuple("DownloadStats", ["bytes", "seconds", "bytes_per_second"])
+
+_row_classes = {}
+
+
+def _workitem_row_class(fields):
+    """Namedtuple ``WorkitemRow`` with ``id`` and attributes for the tuple of fields.
+    Attribute names are reference names without ``System.`` prefix
+    with other characters than letters, digits and "_" replaced by "_",
+    e.g. ``Title`` or ``Microsoft_VSTS_Common_Priority``
+    """
+    row_class = _row_classes.get(fields)
+    if row_class is None:
+        names = [
+            re.sub(r"\W", "_", x[7:] if x.lower().startswith("system.") else x)
+            for x in fields
+        ]
+        row_class = _row_classes[fields] = namedtuple(
+            "WorkitemRow", ["id"] + names, rename=True
+        )
+    return row_class
 
 
 def batch(iterable, n=1):
@@ -18,6 +115,48 @@ def batch(iterable, n=1):
         yield iterable[ndx : min(ndx + n, len_)]
 
 
+def _workitem_id(url):
+    """Id of the work item by its API url or None if the url is not of a work item"""
+    head, _, last = url.rstrip("/").rpartition("/")
+    if head.lower().endswith("/_apis/wit/workitems") and last.isdigit():
+        return int(last)
+    return None
+
+
+def _link_key(id_, target, rel):
+    """Key of the link between two work items, the same for both sides of it"""
+    # Opposite sides of links have "-Forward" and "-Reverse" types
+    rel = rel.rsplit("-", 1)[0] if rel.endswith(("-Forward", "-Reverse")) else rel
+    return "{} {} {}".format(min(id_, target), max(id_, target), rel)
+
+
+def map_ordered(function, items, workers):
+    """Like ``ThreadPoolExecutor.map``, but items are taken lazily
+    and at most ``workers`` of them are processed at the same time
+
+    :return: generator of results in the order of items
+    """
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = deque()
+    try:
+        for item in items:
+            futures.append(executor.submit(function, item))
+            if len(futures) >= workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        # The caller stopped iteration, don't process the rest of items
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
 class TFSAPI:
     def __init__(
         self,
@@ -30,6 +169,18 @@ class TFSAPI:
         auth_type=HTTPBasicAuth,
         connect_timeout=20,
         read_timeout=180,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        max_retries=0,
+        rate_limiter=None,
+        cache=None,
+        instrumentation=None,
+        coalesce_requests=False,
+        transport="requests",
+        json_codec="auto",
+        lazy=False,
+        workitemsbatch=None,
     ):
         """
         This class must be used to get first object from TFS
@@ -42,6 +193,34 @@ class TFSAPI:
         :param verify: True|False - verify HTTPS cert
         :param connect_timeout: Requests CONNECTION timeout, sec or None
         :param read_timeout: Requests READ timeout, sec or None
+        :param pool_connections: number of hosts to keep connection pools for
+        :param pool_maxsize: max number of keep-alive connections to one host,
+            set it not less than number of threads sending requests
+        :param pool_block: when True, threads wait for a free connection when
+            ``pool_maxsize`` connections are in use
+        :param max_retries: retries of failed connections, int or ``urllib3.Retry``
+        :param rate_limiter: :class:`AdaptiveRateLimiter` instance to limit rate of requests
+            and retry throttled ones, no limits by default
+        :param cache: :class:`MemoryCache`, :class:`FileCache`, :class:`SQLiteCache`
+            or other cache backend for GET responses
+        :param instrumentation: :class:`RequestMetrics` or any object with ``on_request(event)``
+            method called with :class:`RequestEvent` after each request
+        :param coalesce_requests: when True, identical GET requests sent from different threads
+            at the same time are sent once, each thread gets its own copy of the result
+        :param transport: "requests", "httpx" (HTTP/2, requires ``pip install httpx[http2]``)
+            or :class:`RequestsTransport`, :class:`HttpxTransport` instance.
+            Connection, auth, verify and timeout parameters are used only when the name is given.
+            "httpx" supports ``HTTPBasicAuth``, ``HTTPDigestAuth`` and ``httpx.Auth`` classes
+            as ``auth_type``, not ``HttpNtlmAuth``: use "requests" with NTLM
+        :param json_codec: "auto" - the fastest installed of orjson, ujson, simdjson and json,
+            name of one of them or :class:`JSONCodec` to encode and decode bodies
+        :param lazy: when True, nested objects and lists of resources are created
+            on the first access of their attributes, not when the resource is got
+        :param workitemsbatch: get work items with POST ``wit/workitemsbatch`` (up to 200 per request)
+            when the server supports it (API 5.0+, detected by the first request, see
+            :meth:`workitemsbatch_supported`). None - only when ``cache`` and
+            ``coalesce_requests`` are not used: POST responses are neither cached nor coalesced,
+            so GET ``wit/workitems`` is sent then. True - always, False - never
         """
         if auth_type is HTTPBasicAuth:
             if (user is None or password is None) and pat is None:
@@ -57,7 +236,26 @@ class TFSAPI:
             verify=verify,
             timeout=(connect_timeout, read_timeout),
             auth_type=auth_type,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=max_retries,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            instrumentation=instrumentation,
+            coalesce_requests=coalesce_requests,
+            transport=transport,
+            json_codec=json_codec,
         )
+        self.lazy = lazy
+        self.workitemsbatch = workitemsbatch
+        # None until POST wit/workitemsbatch is sent, see workitemsbatch_supported
+        self._workitemsbatch_support = None
+        # uri template => True if resource is under the project, see get_json
+        self._resource_locations = {}
+        # (fields, expand) => AdaptiveBatchSize, see get_workitems
+        self._batch_sizes = {}
+        self._batch_sizes_lock = threading.Lock()
 
     def get_tfs_resource(self, uri, underProject=None, payload=None):
         """Return any object in TFS by the uri"""
@@ -65,13 +263,15 @@ class TFSAPI:
 
         # For list results
         if "value" in raw:
-            raw = raw["value"]
-            url = raw[0].get("url", "") if raw else ""
-            tfs_class = class_for_resource(url)
-            return [tfs_class(tfs=self, raw=x, listVersion=True) for x in raw]
+            return self.__list_resources(raw["value"])
         else:
             return class_for_resource(raw["url"])(tfs=self, raw=raw, listVersion=False)
 
+    def __list_resources(self, raw):
+        url = raw[0].get("url", "") if raw else ""
+        tfs_class = class_for_resource(url)
+        return [tfs_class(tfs=self, raw=x, listVersion=True) for x in raw]
+
     def _find_resource(self, resource_class, ids=None):
         """
         Find resource by name and ids
@@ -83,7 +283,9 @@ class TFSAPI:
 
     def get_json(self, uri, underProject=None, payload=None):
         """Get resource from known location or try both locations
-            (under collection and under collection/project)
+            (under collection and under collection/project).
+            The location is remembered for the uri template, when it is successful
+            at the first attempt or the other location returned 404
 
         :param uri: uri of he resource
         :param underProject: base resource location selector
@@ -91,11 +293,50 @@ class TFSAPI:
         """
         if underProject is not None:
             return self.rest_client.send_get(uri, payload=payload, project=underProject)
-        else:
-            try:
-                return self.rest_client.send_get(uri, payload=payload, project=True)
-            except Exception:
-                return self.rest_client.send_get(uri, payload=payload, project=False)
+        if uri.startswith("http") or not self.rest_client.project:
+            # Location is already known or both locations are the same
+            return self.rest_client.send_get(uri, payload=payload, project=False)
+
+        template = uri_template(uri)
+        first = self._resource_locations.get(template, True)
+        try:
+            result = self.rest_client.send_get(uri, payload=payload, project=first)
+        except Exception as e:
+            result = self.rest_client.send_get(uri, payload=payload, project=not first)
+            response = getattr(e, "response", None)
+            if getattr(response, "status_code", None) != 404:
+                # Timeouts and server errors don't tell where the resource is
+                return result
+            first = not first
+        self._resource_locations[template] = first
+        return result
+
+    def discover_resource_locations(self):
+        """Learn resource locations from the server's location metadata
+        (OPTIONS request to ``_apis/``), so :meth:`get_json` sends requests
+        directly to the right location
+
+        :return: number of learned uri templates
+        """
+        raw = self.rest_client.send_options("")
+        count = 0
+        for location in raw.get("value", []):
+            route = location.get("routeTemplate", "")
+            if "_apis/" not in route:
+                continue
+            underProject = route.startswith("{project}")
+            route = route.replace("{area}", location.get("area", ""))
+            route = route.replace("{resource}", location.get("resourceName", ""))
+            segments = uri_template(route).split("/")
+            # Any placeholder is an id. Ids at the end of the route are optional
+            segments = ["{id}" if x.startswith("{") else x for x in segments]
+            while segments:
+                self._resource_locations.setdefault("/".join(segments), underProject)
+                count += 1
+                if segments[-1] != "{id}":
+                    break
+                segments.pop()
+        return count
 
     def substitute_ids(self, uri, ids):
         """Substitute id placeholders in the uri
@@ -110,41 +351,364 @@ class TFSAPI:
 
         return uri.format(ids)
 
-    def __get_workitems(self, work_items_ids, fields=None, expand="all"):
+    def __get_workitems(self, work_items_ids, fields=None, expand="all", as_of=None):
+        raw = self._get_workitems_raw(
+            work_items_ids, fields=fields, expand=expand, as_of=as_of
+        )
+        return self.__list_resources(raw)
+
+    def _get_workitems_raw(self, work_items_ids, fields=None, expand="all", as_of=None):
+        """Get work items in one request: POST ``wit/workitemsbatch`` if it is used,
+        see :meth:`workitemsbatch_used` (up to 200 ids), GET ``wit/workitems``
+        with ids in the query otherwise
+
+        :param as_of: datetime or ISO 8601 string, get work items as of this time
+        :return: list of dicts with JSON of work items
+        """
         ids_string = ",".join(map(str, work_items_ids))
+        if isinstance(as_of, datetime):
+            as_of = as_of.isoformat()
+
+        ids = ids_string.split(",")
+        if self.workitemsbatch_used() and len(ids) <= WORKITEMSBATCH_MAX_IDS:
+            data = {"ids": [int(x) for x in ids]}
+            if fields:
+                data["fields"] = list(fields)
+            elif expand:
+                # The server rejects $expand together with fields
+                data["$expand"] = expand
+            if as_of:
+                data["asOf"] = as_of
+            probe = self._workitemsbatch_support is None
+            try:
+                raw = self.rest_client.send_post(
+                    "wit/workitemsbatch",
+                    data=data,
+                    payload={"api-version": WORKITEMSBATCH_API_VERSION},
+                )
+            except requests.exceptions.HTTPError as e:
+                # Older servers don't know the endpoint or API version 5.0
+                status = e.response.status_code if e.response is not None else None
+                if not probe or status not in (400, 404, 405, 501):
+                    raise
+            else:
+                self._workitemsbatch_support = True
+                return raw["value"]
+            raw = self.get_json(
+                "wit/workitems?"
+                + self.__workitems_query(ids_string, fields, expand, as_of),
+                underProject=False,
+            )
+            # GET works, so the request itself is valid
+            self._workitemsbatch_support = False
+            return raw["value"]
+
+        raw = self.get_json(
+            "wit/workitems?"
+            + self.__workitems_query(ids_string, fields, expand, as_of),
+            underProject=False,
+        )
+        return raw["value"]
+
+    @staticmethod
+    def __workitems_query(ids_string, fields, expand, as_of):
+        if isinstance(as_of, datetime):
+            as_of = as_of.isoformat()
         expand = "&$expand={}".format(expand) if expand else ""
         fields_string = ("&fields=" + ",".join(fields)) if fields else ""
-        workitems = self.get_tfs_resource(
-            "wit/workitems?ids={ids}{fields}{expand}&api-version=1.0".format(
-                ids=ids_string, fields=fields_string, expand=expand
-            ),
-            underProject=False,
+        as_of_string = "&asOf=" + quote(as_of) if as_of else ""
+        return "ids={ids}{fields}{expand}{as_of}&api-version=1.0".format(
+            ids=ids_string, fields=fields_string, expand=expand, as_of=as_of_string
         )
-        return workitems
+
+    def workitemsbatch_supported(self):
+        """True if the server supports POST ``wit/workitemsbatch``, False if it doesn't,
+        None if it is not known yet. It is detected by the first POST: when the server
+        rejects it and the same GET ``wit/workitems`` request succeeds, it is not supported.
+        API version 5.0+ of responses means support too, but the server returns
+        the requested version, so 1.0 of ``wit/workitems`` responses means nothing
+        """
+        if self._workitemsbatch_support is not None:
+            return self._workitemsbatch_support
+        match = re.match(r"(\d+)\.(\d+)", self.rest_client.api_version or "")
+        if match and (int(match.group(1)), int(match.group(2))) >= (5, 0):
+            return True
+        return None
+
+    def workitemsbatch_used(self):
+        """True if work items are got with POST ``wit/workitemsbatch``, or its support
+        is detected by the next request, see ``workitemsbatch`` parameter of :class:`TFSAPI`
+        """
+        if self.workitemsbatch is None:
+            rest_client = self.rest_client
+            if rest_client.cache is not None or rest_client.coalesce_requests:
+                return False
+        elif not self.workitemsbatch:
+            return False
+        return self.workitemsbatch_supported() is not False
+
+    def _workitems_batch_size(self, batch_size):
+        if batch_size is not None:
+            return batch_size
+        return WORKITEMSBATCH_MAX_IDS if self.workitemsbatch_used() else 50
+
+    def _adaptive_batch_size(self, batch_size, fields, expand):
+        """Sizer for ``batch_size="auto"``, one per combination of fields and expand,
+        or None if the batch size is fixed
+        """
+        if isinstance(batch_size, AdaptiveBatchSize):
+            return batch_size
+        if batch_size != "auto":
+            return None
+        key = (tuple(fields) if fields else None, expand)
+        with self._batch_sizes_lock:
+            if key not in self._batch_sizes:
+                self._batch_sizes[key] = AdaptiveBatchSize(
+                    initial=self._workitems_batch_size(None)
+                )
+            return self._batch_sizes[key]
+
+    def batch_size_stats(self):
+        """Batch sizes chosen for ``batch_size="auto"``
+
+        :return: dict by (fields, expand) with :meth:`AdaptiveBatchSize.stats`
+        """
+        with self._batch_sizes_lock:
+            sizers = dict(self._batch_sizes)
+        return {key: sizer.stats() for key, sizer in sizers.items()}
+
+    def __adaptive_workitems(
+        self, work_items_ids, sizer, fields, expand, as_of, workers, convert=None
+    ):
+        """Get work items by batches sized by :class:`AdaptiveBatchSize`.
+        Batch failed with timeout, 413 or 414 error is split in halves and requested again
+
+        :param workers: max number of batches requested at the same time
+        :param convert: function converting the list of JSON of work items,
+            they are converted to :class:`Workitem` by default
+        :return: generator of lists of converted work items in input order
+        """
+        convert = convert or self.__list_resources
+        ids = [
+            x for id_ in self.__ids_list(work_items_ids) for x in str(id_).split(",")
+        ]
+
+        def batches():
+            start = 0
+            while start < len(ids):
+                query_length = None
+                if not self.workitemsbatch_used():
+                    query_length = len(
+                        self.__workitems_query("", fields, expand, as_of)
+                    )
+                size = sizer.limit(ids[start : start + sizer.max_size], query_length)
+                yield ids[start : start + size]
+                start += size
+
+        def get_batch(work_items_batch):
+            started = time.monotonic()
+            try:
+                raw = self._get_workitems_raw(
+                    work_items_batch, fields=fields, expand=expand, as_of=as_of
+                )
+            except (requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+                too_large = isinstance(e, requests.exceptions.Timeout) or (
+                    e.response is not None and e.response.status_code in (413, 414)
+                )
+                if not too_large or len(work_items_batch) == 1:
+                    raise
+                sizer.failure(len(work_items_batch))
+                half = len(work_items_batch) // 2
+                return get_batch(work_items_batch[:half]) + get_batch(
+                    work_items_batch[half:]
+                )
+            sizer.success(
+                len(work_items_batch),
+                time.monotonic() - started,
+                self.rest_client.last_response_size(),
+            )
+            return convert(raw)
+
+        return map_ordered(get_batch, batches(), workers)
 
     def get_workitem(self, id_, fields=None):
         if isinstance(id_, int):
             return self.get_workitems(id_, fields)[0]
 
-    def get_workitems(self, work_items_ids, fields=None, batch_size=50, expand="all"):
-        if isinstance(work_items_ids, int):
-            work_items_ids = [work_items_ids]
-        if isinstance(work_items_ids, str):
-            work_items_ids = [work_items_ids]
+    def get_workitems(
+        self,
+        work_items_ids,
+        fields=None,
+        batch_size=None,
+        expand="all",
+        max_workers=None,
+        as_of=None,
+    ):
+        """Get work items by ids
+
+        :param work_items_ids: list of ids, single id or string of ids separated with comma
+        :param fields: list of field reference names to return, all fields by default
+        :param batch_size: max number of work items requested in one HTTP request,
+            by default 200 if ``wit/workitemsbatch`` is used, 50 otherwise.
+            "auto" or :class:`AdaptiveBatchSize` - tune it by latency and size of responses,
+            see :meth:`batch_size_stats`
+        :param expand: value of the ``$expand`` request parameter
+        :param max_workers: when greater than 1, send batches concurrently
+            using a thread pool of this size. Work items are returned in input order
+        :param as_of: datetime or ISO 8601 string, get work items as of this time
+        :return: list of :class:`Workitem`
+        """
+        sizer = self._adaptive_batch_size(batch_size, fields, expand)
+        if sizer is not None:
+            workitems = []
+            for work_items_batch_info in self.__adaptive_workitems(
+                work_items_ids, sizer, fields, expand, as_of, max_workers or 1
+            ):
+                workitems += work_items_batch_info
+            return workitems
+
+        batch_size = self._workitems_batch_size(batch_size)
+        batches = list(batch(self.__ids_list(work_items_ids), batch_size))
+
+        def get_batch(work_items_batch):
+            return self.__get_workitems(
+                work_items_batch, fields=fields, expand=expand, as_of=as_of
+            )
 
         workitems = []
-        for work_items_batch in batch(list(work_items_ids), batch_size):
-            work_items_batch_info = self.__get_workitems(
-                work_items_batch, fields=fields, expand=expand
-            )
-            workitems += work_items_batch_info
+        if max_workers and max_workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # map() yields results in the order of submitted batches
+                for work_items_batch_info in executor.map(get_batch, batches):
+                    workitems += work_items_batch_info
+        else:
+            for work_items_batch in batches:
+                workitems += get_batch(work_items_batch)
         return workitems
 
+    def iter_workitems(
+        self,
+        work_items_ids,
+        fields=None,
+        batch_size=None,
+        expand="all",
+        prefetch=2,
+        as_of=None,
+    ):
+        """Iterate over work items batch by batch. The first work item is available
+        after the first batch is received and only ``prefetch + 1`` batches are kept in memory
+
+        :param work_items_ids: list of ids, single id or string of ids separated with comma
+        :param fields: list of field reference names to return, all fields by default
+        :param batch_size: max number of work items requested in one HTTP request,
+            by default 200 if ``wit/workitemsbatch`` is used, 50 otherwise.
+            "auto" or :class:`AdaptiveBatchSize` - tune it by latency and size of responses,
+            see :meth:`batch_size_stats`
+        :param expand: value of the ``$expand`` request parameter
+        :param prefetch: number of the next batches requested in background threads
+            while the current one is processed, 0 - request batches one by one
+        :param as_of: datetime or ISO 8601 string, get work items as of this time
+        :return: generator of :class:`Workitem` in input order
+        """
+        sizer = self._adaptive_batch_size(batch_size, fields, expand)
+        if sizer is not None:
+            batches_info = self.__adaptive_workitems(
+                work_items_ids, sizer, fields, expand, as_of, prefetch + 1
+            )
+        else:
+            batch_size = self._workitems_batch_size(batch_size)
+            batches = batch(self.__ids_list(work_items_ids), batch_size)
+
+            def get_batch(work_items_batch):
+                return self.__get_workitems(
+                    work_items_batch, fields=fields, expand=expand, as_of=as_of
+                )
+
+            batches_info = map_ordered(get_batch, batches, prefetch + 1)
+
+        for work_items_batch_info in batches_info:
+            yield from work_items_batch_info
+
+    def get_workitem_rows(
+        self,
+        work_items_ids,
+        fields,
+        row_class=None,
+        batch_size=None,
+        max_workers=None,
+        as_of=None,
+    ):
+        """Get only the given fields of work items as rows, e.g. for reports.
+        Only these fields are requested and :class:`Workitem` objects are not created
+
+        :param work_items_ids: list of ids, single id or string of ids separated with comma
+        :param fields: list of field reference names, e.g. ``["System.Title", "System.State"]``
+        :param row_class: class or function called with the id and values of the fields
+            in the order of ``fields``, e.g. a dataclass. By default a namedtuple
+            ``WorkitemRow`` with ``id`` and the fields without ``System.`` prefix
+            and with "_" instead of dots: ``row.Title``, ``row.Microsoft_VSTS_Common_Priority``
+        :param batch_size: max number of work items requested in one HTTP request,
+            like in :meth:`get_workitems`
+        :param max_workers: when greater than 1, send batches concurrently
+            using a thread pool of this size. Rows are returned in input order
+        :param as_of: datetime or ISO 8601 string, get work items as of this time
+        :return: list of rows, value of a field is None if the work item has no value
+        """
+        fields = tuple(fields)
+        if not fields:
+            raise ValueError("fields are required for rows of work items")
+        row_class = row_class or _workitem_row_class(fields)
+
+        def rows(raw):
+            result = []
+            for workitem in raw:
+                values = workitem.get("fields") or {}
+                get = values.get
+                row = [get(x) for x in fields]
+                if None in row:
+                    # Missing values or names in other case than in the response
+                    lower = {k.lower(): v for k, v in values.items()}
+                    row = [lower.get(x.lower()) for x in fields]
+                result.append(row_class(workitem["id"], *row))
+            return result
+
+        sizer = self._adaptive_batch_size(batch_size, fields, None)
+        if sizer is not None:
+            batches_info = self.__adaptive_workitems(
+                work_items_ids, sizer, fields, None, as_of, max_workers or 1, rows
+            )
+        else:
+            batch_size = self._workitems_batch_size(batch_size)
+            batches = batch(self.__ids_list(work_items_ids), batch_size)
+
+            def get_batch(work_items_batch):
+                return rows(
+                    self._get_workitems_raw(
+                        work_items_batch, fields=fields, expand=None, as_of=as_of
+                    )
+                )
+
+            batches_info = map_ordered(get_batch, batches, max_workers or 1)
+
+        result = []
+        for rows_batch in batches_info:
+            result += rows_batch
+        return result
+
+    @staticmethod
+    def __ids_list(work_items_ids):
+        if isinstance(work_items_ids, int):
+            return [work_items_ids]
+        if isinstance(work_items_ids, str):
+            return [work_items_ids]
+        return list(work_items_ids)
+
     def get_changeset(self, id):
         return self._find_resource(Changeset, ids=id)
 
-    def get_changesets(self, from_=None, to_=None, item_path=None, top=10000):
-        payload = {"$top": top}
+    @staticmethod
+    def __changesets_criteria(from_=None, to_=None, item_path=None):
+        payload = {}
 
         if from_:
             from_ = str(from_)
@@ -162,11 +726,71 @@ class TFSAPI:
 
         if item_path:
             payload["searchCriteria.itemPath"] = item_path
+        return payload
+
+    def get_changesets(self, from_=None, to_=None, item_path=None, top=10000):
+        payload = {"$top": top}
+        payload.update(self.__changesets_criteria(from_, to_, item_path))
         changesets = self.get_tfs_resource(
             "tfvc/changesets", underProject=False, payload=payload
         )
         return changesets
 
+    def iter_changesets(
+        self, from_=None, to_=None, item_path=None, page_size=1000, prefetch=True
+    ):
+        """Iterate over changesets page by page, so all of them are never kept in memory
+
+        :param page_size: number of changesets requested in one HTTP request
+        :param prefetch: request the next page while the current one is processed
+        :return: generator of :class:`Changeset`
+        """
+        payload = self.__changesets_criteria(from_, to_, item_path)
+        for page in self._iter_pages(
+            "tfvc/changesets", payload, page_size, underProject=False, prefetch=prefetch
+        ):
+            yield from page
+
+    def _iter_pages(self, uri, payload, page_size, underProject=None, prefetch=True):
+        """Get list resource page by page with ``$top`` and ``$skip`` parameters
+        until a page is shorter than ``page_size``
+
+        :param prefetch: request the next page in the background thread
+            while the caller processes the current one
+        :return: generator of lists of resources
+        """
+
+        def get_page(skip):
+            page_payload = dict(payload, **{"$top": page_size, "$skip": skip})
+            return self.get_tfs_resource(
+                uri, underProject=underProject, payload=page_payload
+            )
+
+        if not prefetch:
+            skip = 0
+            while True:
+                page = get_page(skip)
+                yield page
+                if len(page) < page_size:
+                    return
+                skip += page_size
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            skip = 0
+            future = executor.submit(get_page, skip)
+            while True:
+                page = future.result()
+                if len(page) < page_size:
+                    yield page
+                    return
+                skip += page_size
+                future = executor.submit(get_page, skip)
+                yield page
+        finally:
+            # Don't wait for the prefetched page if the caller stopped iteration
+            executor.shutdown(wait=False)
+
     def get_projects(self):
         """Deprecated. Use projects instead"""
         return self.projects
@@ -253,6 +877,249 @@ class TFSAPI:
         )
         return raw
 
+    def update_workitems(
+        self,
+        updates,
+        params=None,
+        revs=None,
+        chunk=WIT_BATCH_MAX_REQUESTS,
+        max_workers=4,
+    ):
+        """Update many work items with POST ``wit/$batch`` requests sent concurrently.
+        Work items are updated independently, a failed update does not stop others
+
+        :param updates: dict of JSON patch operations by work item id, e.g.
+            ``{100: [{"op": "add", "path": "/fields/System.Title", "value": "New"}]}``
+        :param params: query parameters of each update, e.g. ``{"bypassRules": True}``
+        :param revs: dict of expected revisions by work item id, ``test /rev`` operation
+            is added to the update, so it fails with status 412 if the work item was changed
+        :param chunk: number of updates in one request, 200 max
+        :param max_workers: number of requests sent at the same time
+        :return: dict of :class:`WorkitemResult` by work item id in the order of updates
+        """
+        query = self.__batch_query(params)
+        patch_requests = []
+        for work_item_id, operations in updates.items():
+            operations = list(operations)
+            if revs is not None and work_item_id in revs:
+                operations.insert(
+                    0, {"op": "test", "path": "/rev", "value": revs[work_item_id]}
+                )
+            uri = "/_apis/wit/workitems/{}?{}".format(work_item_id, query)
+            patch_requests.append((work_item_id, self.__patch_request(uri, operations)))
+
+        return {
+            result.id: result
+            for result in self.__send_wit_batch(patch_requests, chunk, max_workers)
+        }
+
+    def create_workitems(
+        self,
+        specs,
+        max_workers=4,
+        chunk=WIT_BATCH_MAX_REQUESTS,
+        use_batch=True,
+        validate_only=None,
+        bypass_rules=None,
+        suppress_notifications=None,
+    ):
+        """Create many work items concurrently. Work items are created without relations,
+        then relations are added by :meth:`update_workitems`, so they can link work items of the same set.
+        A failed work item does not stop others
+
+        :param specs: list of dicts with ``type``, ``fields`` and optional ``relations``:
+            list of dict(rel, url[, attributes]) or dict(rel, target[, attributes]),
+            where ``target`` is the index of the linked work item in specs
+        :param max_workers: number of requests sent at the same time
+        :param chunk: number of work items in one ``wit/$batch`` request, 200 max
+        :param use_batch: True - create with ``wit/$batch`` requests, False - one POST per work item
+        :param validate_only: When True, validate all work items without creation,
+            relations with ``target`` are not validated
+        :param bypass_rules: When True, can bypass restrictions like <ALLOWEDVALUES> and such
+        :param suppress_notifications: When true, notifications are [supposedly] not sent
+        :return: list of :class:`WorkitemResult` in the order of specs, ``id`` is the id of the created
+            work item. Work item created without some of relations is not ``ok``, but has ``id``
+        """
+        params = {
+            "validateOnly": validate_only,
+            "bypassRules": bypass_rules,
+            "suppressNotifications": suppress_notifications,
+        }
+        # Fail before any work item is created
+        for index, spec in enumerate(specs):
+            for relation in spec.get("relations") or []:
+                target = relation.get("target")
+                if "target" in relation and (
+                    not isinstance(target, int)
+                    or isinstance(target, bool)
+                    or not 0 <= target < len(specs)
+                ):
+                    raise ValueError(
+                        "Relation of specs[{}] has invalid target {!r}, "
+                        "it must be an index in specs".format(index, target)
+                    )
+
+        bodies = []
+        for spec in specs:
+            body = [
+                dict(op="add", path="/fields/{}".format(name), value=value)
+                for name, value in (spec.get("fields") or {}).items()
+            ]
+            if validate_only:
+                body.extend(
+                    dict(op="add", path="/relations/-", value=relation)
+                    for relation in spec.get("relations") or []
+                    if "target" not in relation
+                )
+            bodies.append(body)
+
+        if use_batch:
+            query = self.__batch_query(params)
+            project = quote(self.rest_client.project or "")
+            create_requests = [
+                (
+                    index,
+                    self.__patch_request(
+                        "/{}/_apis/wit/workitems/${}?{}".format(
+                            project, quote(spec["type"]), query
+                        ),
+                        body,
+                    ),
+                )
+                for index, (spec, body) in enumerate(zip(specs, bodies))
+            ]
+            results = list(self.__send_wit_batch(create_requests, chunk, max_workers))
+        else:
+
+            def create(index):
+                try:
+                    raw = self.__create_workitem(
+                        specs[index]["type"],
+                        bodies[index],
+                        validate_only,
+                        bypass_rules,
+                        suppress_notifications,
+                    )
+                except (requests.exceptions.RequestException, TFSClientError) as e:
+                    return self.__failed_result(index, e)
+                return WorkitemResult(index, True, 200, raw, None)
+
+            results = list(map_ordered(create, range(len(specs)), max_workers))
+
+        results = [
+            result._replace(id=result.result.get("id") or None if result.ok else None)
+            for result in results
+        ]
+        if validate_only:
+            return results
+
+        # Second pass: link created work items
+        relations = {}
+        for index, spec in enumerate(specs):
+            if not results[index].ok or not spec.get("relations"):
+                continue
+            operations = []
+            for relation in spec["relations"]:
+                relation = dict(relation)
+                if "target" in relation:
+                    target = results[relation.pop("target")]
+                    if not target.ok:
+                        results[index] = results[index]._replace(
+                            ok=False, error="Linked work item is not created"
+                        )
+                        continue
+                    relation["url"] = target.result["url"]
+                operations.append(dict(op="add", path="/relations/-", value=relation))
+            if operations:
+                relations[results[index].id] = (index, operations)
+
+        updated = self.update_workitems(
+            {
+                work_item_id: operations
+                for work_item_id, (_, operations) in relations.items()
+            },
+            params={
+                "bypassRules": bypass_rules,
+                "suppressNotifications": suppress_notifications,
+            },
+            chunk=chunk,
+            max_workers=max_workers,
+        )
+        for work_item_id, update in updated.items():
+            index = relations[work_item_id][0]
+            if update.ok:
+                results[index] = results[index]._replace(result=update.result)
+            else:
+                results[index] = results[index]._replace(
+                    ok=False,
+                    status=update.status,
+                    error="Relations are not added: {}".format(update.error),
+                )
+        return results
+
+    @staticmethod
+    def __batch_query(params):
+        """Query string of one request in ``wit/$batch``"""
+        return "&".join(
+            "{}={}".format(key, quote(str(value)))
+            for key, value in dict({"api-version": "1.0"}, **(params or {})).items()
+            if value is not None
+        )
+
+    @staticmethod
+    def __patch_request(uri, operations):
+        return {
+            "method": "PATCH",
+            "uri": uri,
+            "headers": {"Content-Type": "application/json-patch+json"},
+            "body": operations,
+        }
+
+    def __send_wit_batch(self, keyed_requests, chunk, max_workers):
+        """Send requests in concurrent POST ``wit/$batch`` requests
+
+        :param keyed_requests: list of (key, request), the key is the id of the result
+        :return: generator of :class:`WorkitemResult` in the order of requests
+        """
+
+        def send_batch(batch_requests):
+            try:
+                raw = self.rest_client.send_post(
+                    "wit/$batch",
+                    data=[request for _, request in batch_requests],
+                    payload={"api-version": "1.0"},
+                )
+            except (requests.exceptions.RequestException, TFSClientError) as e:
+                return [self.__failed_result(key, e) for key, _ in batch_requests]
+            return [
+                self.__batch_result(key, response)
+                for (key, _), response in zip(batch_requests, raw["value"])
+            ]
+
+        batches = batch(keyed_requests, min(chunk, WIT_BATCH_MAX_REQUESTS))
+        for batch_results in map_ordered(send_batch, batches, max_workers):
+            yield from batch_results
+
+    def __batch_result(self, key, response):
+        """Convert one response of ``wit/$batch`` to :class:`WorkitemResult`"""
+        status = response.get("code")
+        body = response.get("body")
+        if isinstance(body, str):
+            try:
+                body = self.rest_client.codec.loads(body.encode("utf-8"))
+            except ValueError:
+                pass
+        if status is not None and 200 <= status < 300:
+            return WorkitemResult(key, True, status, body, None)
+        error = body.get("message", str(body)) if isinstance(body, dict) else str(body)
+        return WorkitemResult(key, False, status, None, error)
+
+    @staticmethod
+    def __failed_result(key, error):
+        response = getattr(error, "response", None)
+        status = response.status_code if response is not None else None
+        return WorkitemResult(key, False, status, None, str(error))
+
     def run_query(self, path):
         """Get query definition by path
         and get Wiql of this query results in the self.result
@@ -282,11 +1149,100 @@ class TFSAPI:
         )
         return Wiql(self, wiql)
 
-    def download_file(self, uri, filename):
-        # TODO: Use download in stream, not in memory
-        r = self.rest_client.send_get(uri, json=False)
-        with open(filename, "wb") as file:
-            file.write(r.content)
+    def download_file(
+        self, uri, filename, chunk_size=64 * 1024, segments=1, max_retries=3
+    ):
+        """Download file by chunks. Dropped downloads are resumed if the server supports ranges
+
+        :param uri: uri or url of the file
+        :param filename: path to the file to write
+        :param chunk_size: max size of data in memory, bytes
+        :param segments: download large file in this number of parallel ranged requests
+        :param max_retries: max number of resumes of one download or segment
+        :return: :class:`DownloadStats`
+        """
+        started = time.monotonic()
+        response = self.rest_client.send_get(uri, json=False, stream=True)
+        size = int(response.headers.get("Content-Length") or 0) or None
+        resumable = response.headers.get("Accept-Ranges") == "bytes"
+
+        if segments > 1 and resumable and size and size >= segments * chunk_size:
+            response.close()
+            with open(filename, "wb") as file:
+                file.truncate(size)
+            segment_size = -(-size // segments)
+            ranges = [
+                (start, min(start + segment_size, size))
+                for start in range(0, size, segment_size)
+            ]
+
+            def download_segment(range_):
+                with open(filename, "r+b") as file:
+                    file.seek(range_[0])
+                    return self.__download_range(
+                        uri, file, None, range_[0], range_[1], chunk_size, max_retries
+                    )
+
+            with ThreadPoolExecutor(max_workers=segments) as executor:
+                downloaded = sum(executor.map(download_segment, ranges))
+        else:
+            with open(filename, "wb") as file:
+                downloaded = self.__download_range(
+                    uri,
+                    file,
+                    response,
+                    0,
+                    size,
+                    chunk_size,
+                    max_retries if resumable else 0,
+                )
+
+        seconds = time.monotonic() - started
+        return DownloadStats(
+            downloaded, seconds, downloaded / seconds if seconds else float(downloaded)
+        )
+
+    def __download_range(
+        self, uri, file, response, start, end, chunk_size, max_retries
+    ):
+        """Write bytes from start to end (or to the end of the file if None) to the file.
+        Request the rest of the range again if the connection was dropped
+
+        :param response: response streaming the range or None to request it
+        :return: number of written bytes
+        """
+        offset = start
+        for attempt in range(max_retries + 1):
+            try:
+                if response is None:
+                    range_ = "bytes={}-{}".format(
+                        offset, "" if end is None else end - 1
+                    )
+                    response = self.rest_client.send_get(
+                        uri, json=False, stream=True, headers={"Range": range_}
+                    )
+                    if response.status_code != 206:
+                        raise TFSClientError(
+                            "Server does not support ranges for {}".format(uri)
+                        )
+                for chunk in response.iter_content(chunk_size):
+                    file.write(chunk)
+                    offset += len(chunk)
+                if end is None or offset >= end:
+                    return offset - start
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                if attempt == max_retries:
+                    raise
+            finally:
+                if response is not None:
+                    response.close()
+                    response = None
+        raise TFSClientError(
+            "Download of {} is incomplete: {} of {} bytes".format(uri, offset, end)
+        )
 
     def get_gitrepositories(self):
         return self.get_tfs_resource("git/repositories", underProject=False)
@@ -427,48 +1383,8 @@ class TFSAPI:
 
         # When copy from another project, adjust AreaPath and IterationPath and do not copy identifying fields
         if from_another_project:
-            no_copy_fields = [
-                "System.TeamProject",
-                "System.AreaPath",
-                "System.IterationPath",
-                "System.Id",
-                "System.AreaId",
-                "System.NodeName",
-                "System.AreaLevel1",
-                "System.AreaLevel2",
-                "System.AreaLevel3",
-                "System.AreaLevel4",
-                "System.Rev",
-                "System.AutorizedDate",
-                "System.RevisedDate",
-                "System.IterationId",
-                "System.IterationLevel1",
-                "System.IterationLevel2",
-                "System.IterationLevel4",
-                "System.CreatedDate",
-                "System.CreatedBy",
-                "System.ChangedDate",
-                "System.ChangedBy",
-                "System.AuthorizedAs",
-                "System.AuthorizedDate",
-                "System.Watermark",
-            ]
-
-            fields = {}
-            for name, value in workitem.fields.items():
-                if name in no_copy_fields:
-                    continue
-                fields[name] = value
-
-            fields["System.AreaPath"] = (
-                target_area
-                if target_area
-                else self.__adjusted_area_iteration(workitem["AreaPath"])
-            )
-            fields["System.IterationPath"] = (
-                target_iteration
-                if target_iteration
-                else self.__adjusted_area_iteration(workitem["IterationPath"])
+            fields = self.__copy_fields(
+                fields, target_area, target_iteration, self.__adjusted_area_iteration
             )
 
         relations = None
@@ -487,6 +1403,181 @@ class TFSAPI:
             wi.add_relations_raw(workitem.data.get("relations", {}), params)
         return wi
 
+    @staticmethod
+    def __copy_fields(fields, target_area, target_iteration, adjusted_path):
+        """Fields of the copy in another project: without identifying fields
+        and with AreaPath and IterationPath in the current project
+
+        :param fields: raw fields of the source work item
+        :param adjusted_path: function to adapt area or iteration path to the current project
+        """
+        copy = {
+            name: value for name, value in fields.items() if name not in NO_COPY_FIELDS
+        }
+        copy["System.AreaPath"] = target_area or adjusted_path(
+            fields["System.AreaPath"]
+        )
+        copy["System.IterationPath"] = target_iteration or adjusted_path(
+            fields["System.IterationPath"]
+        )
+        return copy
+
+    def copy_workitems(
+        self,
+        workitems,
+        with_links_and_attachments=False,
+        from_another_project=False,
+        target_type=None,
+        target_area=None,
+        target_iteration=None,
+        bypass_rules=None,
+        suppress_notifications=None,
+        max_workers=4,
+        chunk=WIT_BATCH_MAX_REQUESTS,
+        checkpoint=None,
+    ):
+        """Copy many work items with concurrent ``wit/$batch`` requests.
+        Relations are added in the final pass, links between copied work items
+        are remapped to link their copies
+
+        :param workitems: list of source :class:`Workitem`
+        :param checkpoint: path to JSON file with the progress. If the copy was interrupted,
+            call it again with the same file to copy only the rest of work items
+        :return: dict of :class:`WorkitemResult` by source work item id, ``id`` is the id of the copy.
+            Work items copied by the previous call have only ``id`` and ``ok``
+
+        Other parameters are the same as of :meth:`copy_workitem`
+        """
+        state = {"copied": {}, "linked": []}
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint, encoding="utf-8") as file:
+                state = json.load(file)
+        # JSON keys are strings
+        copied = {int(source): copy for source, copy in state["copied"].items()}
+        linked = set(state["linked"])
+
+        def save():
+            if checkpoint is None:
+                return
+            tmp_path = checkpoint + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"copied": copied, "linked": sorted(linked)}, file)
+            os.replace(tmp_path, checkpoint)
+
+        results = {
+            source: WorkitemResult(copy["id"], True, None, None, None)
+            for source, copy in copied.items()
+        }
+        params = {
+            "bypassRules": bypass_rules,
+            "suppressNotifications": suppress_notifications,
+        }
+        query = self.__batch_query(params)
+        project = quote(self.rest_client.project or "")
+        # Areas and iterations are shared by many work items
+        paths = {}
+
+        def adjusted_path(value):
+            if value not in paths:
+                paths[value] = self.__adjusted_area_iteration(value)
+            return paths[value]
+
+        create_requests = []
+        for workitem in workitems:
+            if workitem.id in copied:
+                continue
+            fields = workitem.data["fields"]
+            type_ = target_type or fields["System.WorkItemType"]
+            if from_another_project:
+                fields = self.__copy_fields(
+                    fields, target_area, target_iteration, adjusted_path
+                )
+            operations = [
+                dict(op="add", path="/fields/{}".format(name), value=value)
+                for name, value in fields.items()
+            ]
+            uri = "/{}/_apis/wit/workitems/${}?{}".format(project, quote(type_), query)
+            create_requests.append((workitem.id, self.__patch_request(uri, operations)))
+
+        try:
+            for count, result in enumerate(
+                self.__send_wit_batch(create_requests, chunk, max_workers), 1
+            ):
+                source = result.id
+                if result.ok:
+                    copied[source] = {
+                        "id": result.result["id"],
+                        "url": result.result["url"],
+                    }
+                    results[source] = result._replace(id=result.result["id"])
+                else:
+                    results[source] = result._replace(id=None)
+                if count % chunk == 0:
+                    save()
+        finally:
+            save()
+
+        if not with_links_and_attachments:
+            return results
+
+        # Final pass: add relations of copied work items, links to copied work items
+        # are replaced by links to their copies. Added relations are saved in the checkpoint
+        # by keys, links between copied work items by keys of both sides
+        in_set = {workitem.id for workitem in workitems}
+        updates = {}
+        sources = {}
+        added = {}
+        for workitem in workitems:
+            if workitem.id not in copied:
+                continue
+            operations = []
+            keys = []
+            for relation in workitem.data.get("relations") or []:
+                relation = deepcopy(relation)
+                # ID of the attribute has to be unique
+                relation.get("attributes", {}).pop("id", None)
+                target = _workitem_id(relation["url"])
+                if target in in_set:
+                    key = _link_key(workitem.id, target, relation["rel"])
+                    if key in linked or key in added:
+                        # Linking one side creates the opposite link
+                        continue
+                    if target not in copied:
+                        # Linked when the target is copied, not to the source work item
+                        continue
+                    relation["url"] = copied[target]["url"]
+                else:
+                    key = "{} {} {}".format(
+                        workitem.id, relation["rel"], relation["url"]
+                    )
+                    if key in linked:
+                        continue
+                operations.append(dict(op="add", path="/relations/-", value=relation))
+                keys.append(key)
+                added[key] = workitem.id
+            if operations:
+                updates[copied[workitem.id]["id"]] = operations
+                sources[copied[workitem.id]["id"]] = (workitem.id, keys)
+
+        try:
+            updated = self.update_workitems(
+                updates, params=params, chunk=chunk, max_workers=max_workers
+            )
+            for copy_id, update in updated.items():
+                source, keys = sources[copy_id]
+                if update.ok:
+                    linked.update(keys)
+                    results[source] = results[source]._replace(result=update.result)
+                else:
+                    results[source] = results[source]._replace(
+                        ok=False,
+                        status=update.status,
+                        error="Relations are not added: {}".format(update.error),
+                    )
+        finally:
+            save()
+        return results
+
 
 class TFSClientError(Exception):
     pass
@@ -503,6 +1594,16 @@ class TFSHTTPClient:
         verify=False,
         timeout=None,
         auth_type=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        max_retries=0,
+        rate_limiter=None,
+        cache=None,
+        instrumentation=None,
+        coalesce_requests=False,
+        transport="requests",
+        json_codec="auto",
     ):
         if not base_url.endswith("/"):
             base_url += "/"
@@ -518,21 +1619,49 @@ class TFSHTTPClient:
         else:
             self._url_prj = self._url
 
-        self.http_session = requests.Session()
+        headers = {}
+        auth = None
         if pat is not None:
             pat = ":" + pat
             pat_base64 = b"Basic " + base64.b64encode(pat.encode("utf8"))
-            self.http_session.headers.update({"Authorization": pat_base64})
+            headers["Authorization"] = pat_base64
         else:
             auth = (
                 auth_type()
                 if user is None and password is None
                 else auth_type(user, password)
             )
-            self.http_session.auth = auth
+
+        if isinstance(transport, str):
+            if transport not in TRANSPORTS:
+                raise ValueError(
+                    "Unknown transport {}, use one of: {}".format(
+                        transport, ", ".join(TRANSPORTS)
+                    )
+                )
+            transport = TRANSPORTS[transport](
+                auth=auth,
+                headers=headers,
+                verify=verify,
+                timeout=timeout,
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                max_retries=max_retries,
+            )
+        self.transport = transport
+        # requests.Session or httpx.Client
+        self.http_session = transport.session
 
         self.api_version = None
         self.timeout = timeout
+        self.codec = get_codec(json_codec)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.instrumentation = instrumentation
+        self.coalesce_requests = coalesce_requests
+        self._single_flight = SingleFlight() if coalesce_requests else None
+        self._local = threading.local()
         self._verify = verify
         if not self._verify:
             from requests.packages.urllib3.exceptions import InsecureRequestWarning
@@ -553,9 +1682,47 @@ class TFSHTTPClient:
 
         return collection, project
 
-    def send_get(self, uri, payload=None, project=False, json=True):
+    def pool_stats(self):
+        """Statistics of the connection pool
+
+        :return: dict with numbers of sent requests and connections created,
+            reused and discarded because the pool was full
+        """
+        return self.transport.pool_stats()
+
+    def last_response_size(self):
+        """Size of the body of the last JSON response received by the current thread, bytes.
+        0 if the response was taken from the cache
+        """
+        return getattr(self._local, "response_size", 0)
+
+    def send_options(self, uri, payload=None, project=False):
+        return self.__send_request(
+            "OPTIONS", uri, None, payload=payload, underProject=project
+        )
+
+    def send_get(
+        self, uri, payload=None, project=False, json=True, headers=None, stream=False
+    ):
+        if self._single_flight is not None and json and headers is None:
+            key = self.__cache_key(
+                self.__prepare_uri(uri=uri, underProject=project), payload
+            )
+            return self._single_flight.do(
+                key,
+                lambda: self.__send_request(
+                    "GET", uri, None, payload=payload, underProject=project
+                ),
+            )
         return self.__send_request(
-            "GET", uri, None, payload=payload, underProject=project, json=json
+            "GET",
+            uri,
+            None,
+            headers,
+            payload=payload,
+            underProject=project,
+            json=json,
+            stream=stream,
         )
 
     def send_post(self, uri, data, headers=None, payload=None, project=False):
@@ -582,6 +1749,7 @@ class TFSHTTPClient:
         payload=None,
         underProject=False,
         json=True,
+        stream=False,
     ):
         """
         Send request
@@ -598,6 +1766,7 @@ class TFSHTTPClient:
         :param json:
             True - try to convert response to python-object
             False - get as is
+        :param stream: if False, the response content will be immediately downloaded
         :return:
         """
         url = self.__prepare_uri(uri=uri, underProject=underProject)
@@ -612,51 +1781,61 @@ class TFSHTTPClient:
         if headers.get("Content-Type") is None:
             headers["Content-Type"] = "application/json"
 
-        if method == "POST":
-            response = self.http_session.post(
-                url,
-                json=data,
-                verify=self._verify,
-                headers=headers,
-                params=payload,
-                timeout=self.timeout,
-            )
-        elif method == "PUT":
-            response = self.http_session.put(
+        self._local.response_size = 0
+
+        # Send conditional request if we have cached response
+        cache_key = None
+        cached = None
+        if self.cache is not None and method == "GET" and json:
+            cache_key = self.__cache_key(url, payload)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if self.cache.is_fresh(cache_key, cached):
+                    return copy_json(cached.body)
+                if cached.etag:
+                    headers["If-None-Match"] = cached.etag
+                if cached.last_modified:
+                    headers["If-Modified-Since"] = cached.last_modified
+
+        body = self.codec.dumps(data) if data is not None else None
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response = self.__request(
+                method,
                 url,
-                json=data,
-                verify=self._verify,
+                data=body,
                 headers=headers,
                 params=payload,
-                timeout=self.timeout,
-            )
-        elif method == "PATCH":
-            response = self.http_session.patch(
-                url,
-                json=data,
-                verify=self._verify,
-                headers=headers,
-                params=payload,
-                timeout=self.timeout,
-            )
-        else:
-            response = self.http_session.get(
-                url,
-                headers=headers,
-                verify=self._verify,
-                params=payload,
-                timeout=self.timeout,
+                stream=stream,
             )
+            if self.rate_limiter is None or not self.rate_limiter.feedback(
+                response, attempt
+            ):
+                break
+            response.close()
+            attempt += 1
         response.raise_for_status()
 
+        if self.cache is not None and changes_resources(method, url):
+            self.cache.invalidate(url)
+
         if self.api_version is None:
-            api_type = response.headers["Content-Type"].split("; ")[-1].split("=")
+            api_type = (
+                response.headers.get("Content-Type", "").split("; ")[-1].split("=")
+            )
             if api_type[0] == "api-version":
                 self.api_version = api_type[1]
 
         if json:
+            if cached is not None and response.status_code == 304:
+                self.cache.set(cache_key, cached._replace(created=time.time()))
+                return copy_json(cached.body)
             try:
-                result = response.json()
+                # Parse bytes as is, without decoding to text
+                self._local.response_size = len(response.content)
+                result = self.codec.loads(response.content)
 
                 if response.status_code not in (200, 201, 202):
                     raise TFSClientError(
@@ -666,12 +1845,66 @@ class TFSHTTPClient:
                             result["error"] if "error" in result else response.reason,
                         )
                     )
+                if cache_key is not None:
+                    self.__cache_response(cache_key, response, result)
                 return result
             except ValueError:
                 raise TFSClientError("Response is not json: {}".format(response.text))
         else:
             return response
 
+    def __request(self, method, url, **kwargs):
+        """Send request with the transport and report it to the instrumentation hook"""
+        if self.instrumentation is None:
+            return self.transport.request(method, url, **kwargs)
+
+        wait = self.rate_limiter.last_delay if self.rate_limiter is not None else 0.0
+        reset_connect_time()
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.transport.request(method, url, **kwargs)
+            return response
+        finally:
+            total = time.perf_counter() - started
+            status = bytes_in = bytes_out = ttfb = None
+            if response is not None:
+                status = response.status_code
+                ttfb = response.elapsed.total_seconds()
+                bytes_out = len(response.request.body or b"")
+                if kwargs.get("stream"):
+                    bytes_in = int(response.headers.get("Content-Length") or 0)
+                else:
+                    bytes_in = len(response.content)
+            self.instrumentation.on_request(
+                RequestEvent(
+                    method,
+                    uri_template(url),
+                    status,
+                    bytes_in or 0,
+                    bytes_out or 0,
+                    wait,
+                    connect_time(),
+                    ttfb,
+                    total,
+                )
+            )
+
+    @staticmethod
+    def __cache_key(url, payload):
+        """Full url with query parameters"""
+        request = PreparedRequest()
+        request.prepare_url(url, payload)
+        return request.url
+
+    def __cache_response(self, cache_key, response, result):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified or self.cache.ttl_for(cache_key):
+            self.cache.set(
+                cache_key, CacheEntry(etag, last_modified, result, time.time())
+            )
+
     def __prepare_uri(self, underProject, uri):
         """
         Convert URI to URL
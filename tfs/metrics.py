@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of requests sent by TFSHTTPClient
+"""
+import threading
+from collections import namedtuple
+
+RequestEvent = namedtuple(
+    "RequestEvent",
+    [
+        "method",
+        "endpoint",
+        "status",
+        "bytes_in",
+        "bytes_out",
+        "wait",
+        "connect",
+        "ttfb",
+        "total",
+    ],
+)
+RequestEvent.__doc__ = """One HTTP request sent by :class:`TFSHTTPClient`
+
+Status is None if the request failed without response. Times are in seconds:
+``wait`` - delay of the rate limiter, ``connect`` - DNS, TCP and TLS connect (0 for reused connection),
+``ttfb`` - time to the response headers, ``total`` - time to the whole response
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PHASES = ("wait", "connect", "ttfb", "total")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        :return: list of (upper bound, number of values less or equal) including ``+Inf``
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.statuses = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = {phase: Histogram() for phase in PHASES}
+
+
+class RequestMetrics:
+    """Instrumentation hook of :class:`TFSHTTPClient` which aggregates requests
+    by method and endpoint (uri without ids) into latency histograms.
+
+    Any object with the ``on_request(event)`` method can be used as a hook,
+    it gets :class:`RequestEvent` for each sent request
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def on_request(self, event):
+        with self._lock:
+            stats = self._endpoints.get((event.method, event.endpoint))
+            if stats is None:
+                stats = self._endpoints[
+                    (event.method, event.endpoint)
+                ] = EndpointStats()
+            stats.count += 1
+            stats.statuses[event.status] = stats.statuses.get(event.status, 0) + 1
+            stats.bytes_in += event.bytes_in
+            stats.bytes_out += event.bytes_out
+            for phase in PHASES:
+                value = getattr(event, phase)
+                if value is not None:
+                    stats.latency[phase].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def snapshot(self):
+        """
+        :return: dict by ``"METHOD endpoint"`` with counts of requests and statuses,
+            bytes in and out and latency histograms with cumulative buckets
+        """
+        result = {}
+        with self._lock:
+            for (method, endpoint), stats in sorted(self._endpoints.items()):
+                result["{} {}".format(method, endpoint)] = {
+                    "count": stats.count,
+                    "statuses": dict(stats.statuses),
+                    "bytes_in": stats.bytes_in,
+                    "bytes_out": stats.bytes_out,
+                    "latency": {
+                        phase: {
+                            "count": histogram.count,
+                            "sum": histogram.sum,
+                            "buckets": histogram.cumulative(),
+                        }
+                        for phase, histogram in stats.latency.items()
+                    },
+                }
+        return result
+
+    def to_prometheus(self, prefix="tfs"):
+        """Export metrics in Prometheus text format"""
+        lines = [
+            "# HELP {}_requests_total Requests sent to TFS".format(prefix),
+            "# TYPE {}_requests_total counter".format(prefix),
+        ]
+        durations = [
+            "# HELP {}_request_duration_seconds Latency of requests to TFS by phase".format(
+                prefix
+            ),
+            "# TYPE {}_request_duration_seconds histogram".format(prefix),
+        ]
+        transferred = [
+            "# HELP {}_request_bytes_total Bytes transferred to and from TFS".format(
+                prefix
+            ),
+            "# TYPE {}_request_bytes_total counter".format(prefix),
+        ]
+        with self._lock:
+            for (method, endpoint), stats in sorted(self._endpoints.items()):
+                labels = 'method="{}",endpoint="{}"'.format(
+                    method, _escape_label(endpoint)
+                )
+                for status, count in sorted(stats.statuses.items(), key=str):
+                    lines.append(
+                        '{}_requests_total{{{},status="{}"}} {}'.format(
+                            prefix, labels, status or "error", count
+                        )
+                    )
+                for direction in ("in", "out"):
+                    transferred.append(
+                        '{}_request_bytes_total{{{},direction="{}"}} {}'.format(
+                            prefix,
+                            labels,
+                            direction,
+                            getattr(stats, "bytes_" + direction),
+                        )
+                    )
+                for phase, histogram in stats.latency.items():
+                    phase_labels = '{},phase="{}"'.format(labels, phase)
+                    for bound, count in histogram.cumulative():
+                        durations.append(
+                            '{}_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(
+                                prefix,
+                                phase_labels,
+                                "+Inf" if bound == float("inf") else bound,
+                                count,
+                            )
+                        )
+                    durations.append(
+                        "{}_request_duration_seconds_sum{{{}}} {}".format(
+                            prefix, phase_labels, histogram.sum
+                        )
+                    )
+                    durations.append(
+                        "{}_request_duration_seconds_count{{{}}} {}".format(
+                            prefix, phase_labels, histogram.count
+                        )
+                    )
+        return "\n".join(lines + durations + transferred) + "\n"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Connection pool of TFSHTTPClient with usage statistics and connect timings
+"""
+import threading
+import time
+
+from requests.adapters import DEFAULT_POOLBLOCK
+from requests.adapters import DEFAULT_POOLSIZE
+from requests.adapters import DEFAULT_RETRIES
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+
+_local = threading.local()
+
+
+def reset_connect_time():
+    _local.connect_time = 0.0
+
+
+def connect_time():
+    """Seconds spent to open connections (DNS, TCP, TLS) in the current thread
+    since the last :func:`reset_connect_time`
+    """
+    return getattr(_local, "connect_time", 0.0)
+
+
+def add_connect_time(seconds):
+    _local.connect_time = connect_time() + seconds
+
+
+class _TimedConnectionMixin:
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            add_connect_time(time.perf_counter() - started)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class PoolStats:
+    """Thread-safe counters of connection pool usage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.taken = 0
+        self.discarded = 0
+
+    def add(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        """
+        :return: dict with numbers of connections created, reused and discarded
+            (closed because the pool was full) and total requests sent
+        """
+        with self._lock:
+            return {
+                "requests": self.taken,
+                "connections_created": self.created,
+                "connections_reused": max(self.taken - self.created, 0),
+                "connections_discarded": self.discarded,
+            }
+
+
+class _CountingPoolMixin:
+    stats = None
+
+    def _new_conn(self):
+        self.stats.add("created")
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        self.stats.add("taken")
+        return conn
+
+    def _put_conn(self, conn):
+        if conn and self.pool is not None and self.pool.full():
+            self.stats.add("discarded")
+        super()._put_conn(conn)
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class CountingPoolManager(PoolManager):
+    def __init__(self, stats, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+        self.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        pool.stats = self.stats
+        return pool
+
+
+class TFSHTTPAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        pool_connections=DEFAULT_POOLSIZE,
+        pool_maxsize=DEFAULT_POOLSIZE,
+        max_retries=DEFAULT_RETRIES,
+        pool_block=DEFAULT_POOLBLOCK,
+    ):
+        """
+        ``requests`` adapter which counts connections of its pools
+
+        :param pool_connections: number of hosts to keep connection pools for
+        :param pool_maxsize: max number of connections kept open to one host
+        :param max_retries: retries of failed connections, int or ``urllib3.Retry``
+        :param pool_block: when True, wait for a free connection instead of
+            opening a new one which is discarded after use
+        """
+        self.stats = PoolStats()
+        super().__init__(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+            pool_block=pool_block,
+        )
+
+    def init_poolmanager(
+        self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs
+    ):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+
+        self.poolmanager = CountingPoolManager(
+            self.stats,
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            **pool_kwargs
+        )
@@ -4,6 +4,7 @@ TFS API python 3 version
 """
 import os
 import re
+import threading
 from copy import deepcopy
 
 from requests.structures import CaseInsensitiveDict
@@ -11,6 +12,14 @@ from six import iteritems
 
 
 class TFSObject(object):
+    # Attributes set by raw2resource are kept in __dict__
+    __slots__ = ("tfs", "_uri", "_underProject", "data", "__dict__")
+
+    # list of resources from _links property to expose as attributes
+    _links_attrs = ()
+    # raw values of attributes which are not converted yet, see raw2resource
+    _lazy_attrs = None
+
     def __init__(self, data=None, tfs=None, uri="", underProject=None):
         """
         Base tfs resource object initialization
@@ -28,10 +37,15 @@ class TFSObject(object):
         self._uri = uri
         self._underProject = underProject
         self.data = data
-        # list of resources from _links property to expose as attributes
-        self._links_attrs = []
 
-        self._data = self.data  # legacy, some people can use private method
+    @property
+    def _data(self):
+        """Legacy alias of ``data``, some people can use private attribute"""
+        return self.data
+
+    @_data.setter
+    def _data(self, value):
+        self.data = value
 
     def __dir__(self):
         """
@@ -40,7 +54,7 @@ class TFSObject(object):
 
         :return: extended list of attribute name
         """
-        original = super(TFSObject, self).__dir__()
+        original = _lazy_dir(self, super(TFSObject, self).__dir__())
 
         if not self.data:
             return original
@@ -62,8 +76,16 @@ class TFSObject(object):
         :param name:
         :return: mapped or unknown tfs object
         """
+        pending = self._lazy_attrs
+        if pending and name in pending:
+            return _materialize(self, name, pending)
         if self.data and name in self.data.get("_links", {}):
             return self.__get_object_by_links(name)
+        attr = getattr(type(self), name, None)
+        if isinstance(attr, property) and attr.fget is not None:
+            # Python calls __getattr__ when a property raises AttributeError,
+            # call it again to raise the real error, not "has no attribute"
+            return attr.fget(self)
         raise AttributeError(
             "'{}' object has no attribute '{}'".format(self.__class__.__name__, name)
         )
@@ -94,6 +116,12 @@ class TFSObject(object):
 class UnknownTfsObject(TFSObject):
     """Not yet known Resource from TFS."""
 
+    __slots__ = ("_listVersion",)
+
+    # fields to exclude from resource translation and assign as a raw json value
+    raw_attrs = ("_links",)
+    _clone_delete = ("id", "_links")
+
     def __init__(
         self, tfs, raw=None, uri="unknownResource", underProject=None, listVersion=True
     ):
@@ -108,9 +136,6 @@ class UnknownTfsObject(TFSObject):
         :param underProject: indicates that resource located under the project path, None if location is unknown
         :param listVersion: indicates list version of the object
         """
-        # list of fields to exclude from resource translation and assign as a raw json value
-        self.raw_attrs = ["_links"]
-        self._clone_delete = ["id", "_links"]
         # indicates object is a brief version of the full one (commonly in the list result)
         # so to operate on it you need to get a full one
         self._listVersion = listVersion
@@ -206,30 +231,213 @@ class UnknownTfsObject(TFSObject):
         raw2resource(raw, self, self.tfs)
 
 
+_FIELD_PREFIX = "System."
+_FIELD_PREFIX_LOWER = _FIELD_PREFIX.lower()
+_FIELD_KEYS_MAX = 4096
+
+# Field names seen in work items, the first case of a name is canonical:
+# name in lower case => canonical name, and the set of canonical names
+_field_names = {}
+_canonical_names = set()
+# Key in any case, with or without prefix => (canonical names of the key,
+# canonical names of the key and of the key with prefix), names are found
+# before names without prefix
+_field_keys = {}
+_field_names_lock = threading.Lock()
+
+
+def _register_field_names(names):
+    """Remember new names, their case becomes canonical if the name is new in any case"""
+    with _field_names_lock:
+        added = [
+            name
+            for name in names
+            if name not in _canonical_names
+            and _field_names.setdefault(name.lower(), name) == name
+        ]
+        if added:
+            # Keys are resolved again before names are seen as canonical
+            _field_keys.clear()
+            _canonical_names.update(added)
+
+
+def _field_key(key):
+    """Canonical names for the key, see ``_field_keys``"""
+    with _field_names_lock:
+        names = _field_keys.get(key)
+        if names is None:
+            lower = key.lower()
+            name = _field_names.get(lower)
+            short = _field_names.get(_FIELD_PREFIX_LOWER + lower)
+            names = (
+                (name,) if name else (),
+                tuple(x for x in (name, short) if x is not None),
+            )
+            if len(_field_keys) >= _FIELD_KEYS_MAX:
+                _field_keys.clear()
+            _field_keys[key] = names
+        return names
+
+
+class WorkitemFields(CaseInsensitiveDict):
+    """Case insensitive view of the raw fields of a work item.
+    The raw fields are copied on the first change.
+
+    Keys are resolved to names with the module-level map of canonical names,
+    which grows when new names appear, so work items with different fields
+    share it. Only work items with a name in other case than the canonical one,
+    e.g. after ``fields["system.title"] = value``, build an index of their own
+    """
+
+    def __init__(self, data=None, **kwargs):
+        # None - not checked yet, True - all names are canonical
+        self._canonical = None
+        # name in lower case => name, only for not canonical names
+        self._lower = None
+        if isinstance(data, dict) and not kwargs:
+            self._fields = data
+            self._owner = False
+        else:
+            self._fields = {}
+            self._owner = True
+            self.update(data or {}, **kwargs)
+
+    def _is_canonical(self):
+        canonical = self._canonical
+        if canonical is None:
+            fields = self._fields
+            if not _canonical_names.issuperset(fields):
+                _register_field_names(fields)
+            canonical = self._canonical = _canonical_names.issuperset(fields)
+            if not canonical:
+                self._lower = {name.lower(): name for name in fields}
+        return canonical
+
+    def _resolve(self, key, alias):
+        """Name of the field for the key in any case, also without prefix if ``alias``"""
+        if self._is_canonical():
+            fields = self._fields
+            names, aliases = _field_keys.get(key) or _field_key(key)
+            for name in aliases if alias else names:
+                if name in fields:
+                    return name
+            return None
+        lower = key.lower()
+        name = self._lower.get(lower)
+        if name is None and alias:
+            name = self._lower.get(_FIELD_PREFIX_LOWER + lower)
+        return name
+
+    def _name(self, key):
+        """Reference name of the field for the key in any case"""
+        if key in self._fields:
+            return key
+        return self._resolve(key, False)
+
+    def lookup(self, key, default=None):
+        """Value of the field by the name with or without ``System.`` prefix in any case"""
+        fields = self._fields
+        if key in fields:
+            return fields[key]
+        name = self._resolve(key, True)
+        return default if name is None else fields[name]
+
+    def field_names(self):
+        """Names without ``System.`` prefix"""
+        prefix = _FIELD_PREFIX
+        return [
+            name[len(prefix) :] if name.startswith(prefix) else name
+            for name in self._fields
+        ]
+
+    def _changed(self):
+        if not self._owner:
+            self._fields = dict(self._fields)
+            self._owner = True
+        self._canonical = None
+        self._lower = None
+
+    def __getitem__(self, key):
+        name = self._name(key)
+        if name is None:
+            raise KeyError(key)
+        return self._fields[name]
+
+    def __contains__(self, key):
+        return self._name(key) is not None
+
+    def get(self, key, default=None):
+        name = self._name(key)
+        return default if name is None else self._fields[name]
+
+    def __setitem__(self, key, value):
+        name = self._name(key)
+        self._changed()
+        if name is not None and name != key:
+            # Remember the case of the last key like CaseInsensitiveDict
+            del self._fields[name]
+        self._fields[key] = value
+
+    def __delitem__(self, key):
+        name = self._name(key)
+        if name is None:
+            raise KeyError(key)
+        self._changed()
+        del self._fields[name]
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def lower_items(self):
+        return ((name.lower(), value) for name, value in self._fields.items())
+
+    def copy(self):
+        copy = WorkitemFields(dict(self._fields))
+        copy._owner = True
+        return copy
+
+
 class Workitem(UnknownTfsObject):
+    __slots__ = ("id", "fields")
+
+    raw_attrs = ("_links", "fields")
+    _links_attrs = (
+        "workItemHistory",
+        "workItemRevisions",
+        "workItemType",
+        "workItemUpdates",
+    )
+    # Use prefix in automatically lookup.
+    # We don't need use wi['System.History'], we use simple wi['History']
+    _system_prefix = "System."
+
     def __init__(self, tfs=None, raw=None, listVersion=True):
         self.id = None
         self.fields = None
-        # Use prefix in automatically lookup.
-        # We don't need use wi['System.History'], we use simple wi['History']
-        self._system_prefix = "System."
 
         super().__init__(
             tfs, raw, "wit/workItems/{0}", underProject=False, listVersion=listVersion
         )
-        self._links_attrs.extend(
-            ["workItemHistory", "workItemRevisions", "workItemType", "workItemUpdates"]
-        )
 
     def _parse_raw(self, raw):
-        self.raw_attrs.extend(["fields"])
         super()._parse_raw(raw)
 
         if not self.id:
             self.id = self.url.split("/")[-1]
-        if self.fields:
-            self.fields = CaseInsensitiveDict(self.fields)
-            self._fields = self.fields
+        if isinstance(self.fields, dict):
+            self.fields = WorkitemFields(self.fields)
+
+    @property
+    def _fields(self):
+        """Legacy alias of ``fields``"""
+        return self.fields
+
+    @_fields.setter
+    def _fields(self, value):
+        self.fields = value
 
     def __setitem__(self, key, value):
         field_path = "/fields/{}".format(key)
@@ -238,20 +446,10 @@ class Workitem(UnknownTfsObject):
         self.__init__(self.tfs, raw)
 
     def get(self, key, default=None):
-        if key in self.fields:
-            return self.fields[key]
-
-        # try to automatically add prefix
-        key = self._add_prefix(key)
-        return self.fields.get(key, default)
+        return self.fields.lookup(key, default)
 
     def __getitem__(self, key):
-        if key in self.fields:
-            return self.fields[key]
-
-        # try to automatically add prefix
-        key = self._add_prefix(key)
-        return self.fields.get(key)
+        return self.fields.lookup(key)
 
     def _add_prefix(self, key):
         if key.startswith(self._system_prefix):
@@ -267,7 +465,7 @@ class Workitem(UnknownTfsObject):
 
     @property
     def field_names(self):
-        return [self._remove_prefix(x) for x in self.fields]
+        return self.fields.field_names()
 
     @property
     def history(self):
@@ -358,6 +556,8 @@ class Workitem(UnknownTfsObject):
 
 
 class Attachment(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs=None, raw=None, listVersion=True):
         super().__init__(
             tfs, raw, "wit/attachments/{0}", underProject=False, listVersion=listVersion
@@ -369,12 +569,20 @@ class Attachment(UnknownTfsObject):
         self.id = self.url.split("/")[-1]  # Get UUID from url
         self.name = self.attributes.name
 
-    def download(self, path="."):
+    def download(self, path=".", **kwargs):
+        """Download the attachment to the folder
+
+        :param path: path to the folder
+        :param kwargs: parameters of :meth:`TFSAPI.download_file`
+        :return: ``DownloadStats`` with size, time and speed (bytes per second) of the download
+        """
         path = os.path.join(path, self.name)
-        self.tfs.download_file(self.url, path)
+        return self.tfs.download_file(self.url, path, **kwargs)
 
 
 class Changeset(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs,
@@ -399,6 +607,8 @@ class Changeset(UnknownTfsObject):
 
 
 class TFSQuery(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs=None, raw=None, listVersion=False):
         super().__init__(
             tfs,
@@ -425,12 +635,20 @@ class TFSQuery(UnknownTfsObject):
             )
         return self._workitems
 
+    def iter_workitems(self, **kwargs):
+        """Streaming version of :attr:`workitems`, see :meth:`TFSAPI.iter_workitems`"""
+        return self.tfs.iter_workitems(
+            [i["id"] for i in self.result["workItems"]], **kwargs
+        )
+
 
 class Wiql(UnknownTfsObject):
     """
     Work Item Query Language
     """
 
+    __slots__ = ()
+
     def __init__(self, tfs=None, raw=None, listVersion=True):
         super().__init__(
             tfs,
@@ -439,7 +657,10 @@ class Wiql(UnknownTfsObject):
             underProject=True,
             listVersion=listVersion,
         )
-        self.result = self.data
+
+    @property
+    def result(self):
+        return self.data
 
     @property
     def workitem_ids(self):
@@ -450,8 +671,14 @@ class Wiql(UnknownTfsObject):
     def workitems(self):
         return self.tfs.get_workitems(self.workitem_ids)
 
+    def iter_workitems(self, **kwargs):
+        """Streaming version of :attr:`workitems`, see :meth:`TFSAPI.iter_workitems`"""
+        return self.tfs.iter_workitems(self.workitem_ids, **kwargs)
+
 
 class GitRepository(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs,
@@ -463,6 +690,8 @@ class GitRepository(UnknownTfsObject):
 
 
 class Project(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs, raw, "projects/{0}", underProject=False, listVersion=listVersion
@@ -474,6 +703,8 @@ class Project(UnknownTfsObject):
 
 
 class Team(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs,
@@ -485,6 +716,8 @@ class Team(UnknownTfsObject):
 
 
 class Build(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs, raw, "build/builds/{0}", underProject=True, listVersion=listVersion
@@ -492,6 +725,15 @@ class Build(UnknownTfsObject):
 
 
 class Definition(UnknownTfsObject):
+    __slots__ = ()
+
+    _clone_delete = UnknownTfsObject._clone_delete + (
+        "authoredBy",
+        "createdDate",
+        "comment",
+        "revision",
+    )
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs,
@@ -500,7 +742,6 @@ class Definition(UnknownTfsObject):
             underProject=True,
             listVersion=listVersion,
         )
-        self._clone_delete.extend(["authoredBy", "createdDate", "comment", "revision"])
 
     def clone(self, data=None):
         if data is None:
@@ -511,6 +752,8 @@ class Definition(UnknownTfsObject):
 
 
 class Identity(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs, raw, "identities/{0}", underProject=False, listVersion=listVersion
@@ -518,6 +761,8 @@ class Identity(UnknownTfsObject):
 
 
 class Run(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs, raw, "test/runs/{}", underProject=True, listVersion=listVersion
@@ -532,6 +777,8 @@ class Run(UnknownTfsObject):
 
 
 class Result(UnknownTfsObject):
+    __slots__ = ()
+
     def __init__(self, tfs, raw=None, listVersion=False):
         super().__init__(
             tfs,
@@ -547,77 +794,326 @@ class Result(UnknownTfsObject):
 #################################################################################
 
 
-def raw2resource(raw, top=None, tfs=None):
+def raw2resource(raw, top=None, tfs=None, lazy=None):
     """Convert a raw valie into a TFTObject object.
 
     Recursively walks a dict structure, transforming the properties into attributes
     on a new ``TfsObject`` object of the appropriate type
     (if an ``url`` link is present and class found in the class map)
     or a ``TopLevelWrapper`` object.
+
+    :param lazy: convert dicts and lists on the first access of their attributes,
+        by default ``lazy`` attribute of ``tfs``
     """
+    if lazy is None:
+        lazy = getattr(tfs, "lazy", False)
     if top is None:
         top = TopLevelWrapper(raw)
 
-    seqs = tuple, list, set, frozenset
+    pending = None
     for i, j in iteritems(raw):
-        if isinstance(j, dict):
-            if isinstance(top, UnknownTfsObject) and i in top.raw_attrs:
-                setattr(top, i, j)
-            elif "url" in j:
-                resource = class_for_resource(j["url"])(
-                    tfs=tfs, raw=j, listVersion=False
-                )
-                setattr(top, i, resource)
-            else:
-                setattr(top, i, raw2resource(j, tfs=tfs))
-        elif isinstance(j, seqs):
-            seq_list = []
-            for seq_elem in j:
-                if isinstance(seq_elem, dict):
-                    if "url" in seq_elem:
-                        resource = class_for_resource(seq_elem["url"])(
-                            tfs=tfs, raw=seq_elem, listVersion=True
-                        )
-                        seq_list.append(resource)
-                    else:
-                        seq_list.append(raw2resource(seq_elem, tfs=tfs))
-                else:
-                    seq_list.append(seq_elem)
-            setattr(top, i, seq_list)
+        # Attributes which exist already are replaced at once like in the eager mode
+        if (
+            lazy
+            and isinstance(j, (dict,) + _SEQUENCES)
+            and not hasattr(type(top), i)
+            and not _has_instance_attr(top, i)
+        ):
+            if pending is None:
+                pending = top._lazy_attrs
+                if pending is None:
+                    pending = top._lazy_attrs = _LazyAttributes(tfs)
+            pending[i] = j
         else:
-            setattr(top, i, j)
+            setattr(top, i, _resource_value(top, i, j, tfs, lazy))
     return top
 
 
-resource_class_map = {
-    r"build/builds/[^/]+$": Build,
-    r"build/definitions/[^/]+$": Definition,
-    r"git/repositories/[^/]+$": GitRepository,
-    r"identities/[^/]+$": Identity,
-    r"projects/[^/]+$": Project,
-    r"projects/[^/]+/teams/[^/]+$": Team,
-    r"test/runs/[^/]+$": Run,
-    r"test/runs/[^/]+/results/[^/]+$": Result,
-    r"tfvc/changesets/[^/]+$": Changeset,
-    r"wit/attachments/[^/]+$": Attachment,
-    r"wit/queries/.+$": TFSQuery,
-    r"wit/wiql/[^/]+": Wiql,
-    r"wit/workItems/[^/]+$": Workitem,
-}
+_SEQUENCES = tuple, list, set, frozenset
+
+
+def _resource_value(top, name, value, tfs, lazy):
+    """Attribute value of the raw value: resource for dicts with ``url``,
+    ``TopLevelWrapper`` for other dicts and lists of them for sequences
+    """
+    if isinstance(value, dict):
+        if isinstance(top, UnknownTfsObject) and name in top.raw_attrs:
+            return value
+        if "url" in value:
+            return class_for_resource(value["url"])(
+                tfs=tfs, raw=value, listVersion=False
+            )
+        return raw2resource(value, tfs=tfs, lazy=lazy)
+    if isinstance(value, _SEQUENCES):
+        seq_list = []
+        for seq_elem in value:
+            if isinstance(seq_elem, dict):
+                if "url" in seq_elem:
+                    resource = class_for_resource(seq_elem["url"])(
+                        tfs=tfs, raw=seq_elem, listVersion=True
+                    )
+                    seq_list.append(resource)
+                else:
+                    seq_list.append(raw2resource(seq_elem, tfs=tfs, lazy=lazy))
+            else:
+                seq_list.append(seq_elem)
+        return seq_list
+    return value
+
+
+class _LazyAttributes(dict):
+    """Raw values of attributes by names, which are not converted yet"""
+
+    __slots__ = ("tfs",)
+
+    def __init__(self, tfs):
+        super().__init__()
+        self.tfs = tfs
+
+
+def _has_instance_attr(top, name):
+    # Without __getattr__, which can request resources from _links
+    try:
+        object.__getattribute__(top, name)
+    except AttributeError:
+        return False
+    return True
+
+
+def _materialize(top, name, pending):
+    """Convert the raw value of the lazy attribute and keep it as a usual attribute"""
+    value = _resource_value(top, name, pending[name], pending.tfs, True)
+    setattr(top, name, value)
+    pending.pop(name, None)
+    return value
+
+
+def _lazy_dir(top, names):
+    """Names of attributes with lazy ones instead of their storage"""
+    return [x for x in names if x != "_lazy_attrs"] + list(top._lazy_attrs or ())
+
+
+class ResourceClassMap(dict):
+    """Map of url regex patterns to resource classes, checked in the insertion order.
+    Compiled dispatcher of :func:`class_for_resource` is rebuilt when the map is changed
+    """
+
+    def _changed(self):
+        _dispatcher.clear()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def pop(self, *args):
+        try:
+            return super().pop(*args)
+        finally:
+            self._changed()
+
+    def popitem(self):
+        try:
+            return super().popitem()
+        finally:
+            self._changed()
+
+    def setdefault(self, key, default=None):
+        try:
+            return super().setdefault(key, default)
+        finally:
+            self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+class _ResourceDispatcher(object):
+    """All patterns of :data:`resource_class_map` compiled to one regex,
+    or searched one by one if they can't be combined, with cache of results
+    by the url with canonical ids
+    """
+
+    # Numeric and GUID segments of the path
+    id_segment = re.compile(
+        r"/(?:(\d+)|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})"
+        r"(?=[/?#]|$)"
+    )
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # Replaced, not changed, so threads using the old ones are not affected
+        self.compiled = None
+        self.cache = {}
+
+    @staticmethod
+    def compile():
+        """
+        :return: function returning the class for the canonical url
+        """
+        items = list(resource_class_map.items())
+        compiled = [re.compile(resource, re.IGNORECASE) for resource, _ in items]
+        combined = None
+        # Patterns with groups can have backreferences or group names of other patterns
+        if not any(x.groups for x in compiled):
+            # The first pattern matching anywhere in the url wins like with re.search in a loop,
+            # the matched one is found by the name of its group
+            pattern = "^(?:{})".format(
+                "|".join(
+                    "(?=.*?(?P<_{}>{}))".format(index, resource)
+                    for index, (resource, _) in enumerate(items)
+                )
+            )
+            try:
+                combined = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+            except re.error:
+                # E.g. inline global flags are allowed only at the start of the regex
+                pass
+
+        if combined is None:
+
+            def find(url):
+                for regex, (_, resource_class) in zip(compiled, items):
+                    if regex.search(url):
+                        return resource_class
+                return UnknownTfsObject
+
+            return find
+
+        classes = [resource_class for _, resource_class in items]
+
+        def find(url):
+            match = combined.match(url)
+            return classes[int(match.lastgroup[1:])] if match else UnknownTfsObject
+
+        return find
+
+    @staticmethod
+    def canonical_id(match):
+        return "/0" if match.group(1) else "/00000000-0000-0000-0000-000000000000"
+
+    def __call__(self, path):
+        # Patterns don't depend on values of ids, so urls of the same resource type
+        # have one canonical url with ids replaced by 0 or zero GUID
+        key = self.id_segment.sub(self.canonical_id, path)
+        cache = self.cache
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        with self.lock:
+            if self.compiled is None:
+                self.compiled = self.compile()
+            find = self.compiled
+        resource_class = find(key)
+        if len(cache) >= self.maxsize:
+            cache.clear()
+        cache[key] = resource_class
+        return resource_class
+
+
+_dispatcher = _ResourceDispatcher()
+
+resource_class_map = ResourceClassMap(
+    [
+        (r"build/builds/[^/]+$", Build),
+        (r"build/definitions/[^/]+$", Definition),
+        (r"git/repositories/[^/]+$", GitRepository),
+        (r"identities/[^/]+$", Identity),
+        (r"projects/[^/]+$", Project),
+        (r"projects/[^/]+/teams/[^/]+$", Team),
+        (r"test/runs/[^/]+$", Run),
+        (r"test/runs/[^/]+/results/[^/]+$", Result),
+        (r"tfvc/changesets/[^/]+$", Changeset),
+        (r"wit/attachments/[^/]+$", Attachment),
+        (r"wit/queries/.+$", TFSQuery),
+        (r"wit/wiql/[^/]+", Wiql),
+        (r"wit/workItems/[^/]+$", Workitem),
+    ]
+)
+
+
+def register_resource_class(pattern, resource_class, first=True):
+    """Use the class for resources with url matching the pattern
+
+    :param pattern: regex searched in the url case insensitively.
+        It must not depend on values of numeric and GUID ids in the path
+    :param resource_class: subclass of :class:`TFSObject`
+    :param first: check the pattern before the registered ones,
+        e.g. to use a subclass of :class:`Workitem` for work items
+    """
+    # Fail here, not in the next lookup
+    re.compile(pattern)
+    if not first:
+        resource_class_map[pattern] = resource_class
+        return
+    items = [(pattern, resource_class)]
+    items.extend(x for x in resource_class_map.items() if x[0] != pattern)
+    dict.clear(resource_class_map)
+    resource_class_map.update(items)
 
 
 def class_for_resource(path):
-    for resource in resource_class_map:
-        if path and re.search(resource, path, re.IGNORECASE):
-            return resource_class_map[resource]
-    else:
+    if not path:
         return UnknownTfsObject
+    return _dispatcher(path)
 
 
 class TopLevelWrapper(object):
+    __slots__ = ("__dict__",)
+
+    _lazy_attrs = None
+
     def __init__(self, raw):
         __bases__ = raw  # noqa
 
+    def __getattr__(self, name):
+        pending = self._lazy_attrs
+        if pending and name in pending:
+            return _materialize(self, name, pending)
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(self.__class__.__name__, name)
+        )
+
+    def __dir__(self):
+        return _lazy_dir(self, super().__dir__())
+
+
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$",
+    re.IGNORECASE,
+)
+
+
+def uri_template(uri):
+    """Convert uri or url to a template without ids, query and host,
+    e.g. ``wit/workItems/100/revisions?$top=1`` to ``wit/workitems/{id}/revisions``
+    """
+    path = uri.split("?", 1)[0].lower()
+    pos = path.find("_apis/")
+    if pos > -1:
+        path = path[pos + len("_apis/") :]
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in path.strip("/").split("/")
+    )
+
 
 def updateDict(target, updates):
     for key, value in updates.items():
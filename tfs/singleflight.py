@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Deduplication of identical concurrent requests
+"""
+import threading
+
+from tfs.cache import copy_json
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.copies = []
+        self.error = None
+
+
+class SingleFlight:
+    """Run a function once for concurrent calls with the same key.
+    Callers which came while the function is running wait for it and get copies of its result
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        """
+        :param key: hashable key of the call, e.g. url
+        :param function: function without arguments returning python-object created from JSON
+        :return: result of the function
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.copies.pop()
+
+        try:
+            result = function()
+        except BaseException as e:
+            # KeyboardInterrupt, CancelledError too: followers must not wait forever
+            call.error = e
+            raise
+        finally:
+            try:
+                with self._lock:
+                    del self._calls[key]
+                if call.error is None:
+                    # Nobody can join the call now, each follower gets its own copy
+                    call.copies = [copy_json(result) for _ in range(call.followers)]
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                call.done.set()
+        return result
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Client side rate limiting which follows TFS throttling responses
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        rate=10.0,
+        min_rate=0.5,
+        max_rate=100.0,
+        increase=0.5,
+        decrease=0.5,
+        max_retries=5,
+        backoff=1.0,
+        max_backoff=60.0,
+        jitter=0.2,
+    ):
+        """
+        Limit rate of requests and adapt it to the server responses (additive increase,
+        multiplicative decrease). Throttled (429, 503) requests are retried after
+        ``Retry-After`` or exponential backoff delay with random jitter.
+
+        :param rate: initial rate, requests per second
+        :param min_rate: rate is never decreased below this value
+        :param max_rate: rate is never increased above this value
+        :param increase: requests per second added to the rate after each successful request
+        :param decrease: rate is multiplied by this factor after a throttled request
+        :param max_retries: how many times to retry throttled request before raising error
+        :param backoff: first delay in seconds when the server doesn't send ``Retry-After``
+        :param max_backoff: max delay in seconds between retries
+        :param jitter: max part of the delay added randomly, e.g. 0.2 means up to +20%
+        """
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+        self.requests = 0
+        self.throttled = 0
+        self.total_delay = 0.0
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+
+    @property
+    def last_delay(self):
+        """Seconds the last request of the current thread waited before sending"""
+        return getattr(self._local, "delay", 0.0)
+
+    def acquire(self):
+        """Wait until the next request can be sent
+
+        :return: delay in seconds
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._blocked_until)
+            self._next_slot = slot + 1.0 / self.rate
+            self.requests += 1
+            delay = slot - now
+            self.total_delay += delay
+
+        self._local.delay = delay
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def feedback(self, response, attempt=0):
+        """Adapt rate to the server response
+
+        :param response: response of the request sent after :meth:`acquire`
+        :param attempt: number of the retry, 0 for the first try
+        :return: True if the request was throttled and must be sent again
+        """
+        headers = response.headers
+        throttled = response.status_code in THROTTLING_STATUS_CODES
+        with self._lock:
+            if throttled:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                delay = self._retry_after(headers)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2**attempt)
+                self._block(delay * (1 + random.uniform(0, self.jitter)))
+            elif float(headers.get("X-RateLimit-Delay") or 0) > 0:
+                # Server has started to delay our requests, slow down before it throttles
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if remaining is not None and reset is not None and float(remaining) <= 0:
+                # Reset is an epoch time when the used resources are reset
+                self._block(min(float(reset) - time.time(), self.max_backoff))
+
+        return throttled and attempt < self.max_retries
+
+    def stats(self):
+        """
+        :return: dict with current rate and counters of requests, throttled requests
+            and the total delay
+        """
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "total_delay": self.total_delay,
+            }
+
+    def _block(self, delay):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+
+    @staticmethod
+    def _retry_after(headers):
+        value = headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Transports which send requests of TFSHTTPClient: ``requests`` (default)
+and ``httpx`` with HTTP/2 support
+"""
+import json
+import ssl
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+import requests
+from requests.auth import HTTPBasicAuth
+from requests.auth import HTTPDigestAuth
+from requests_ntlm import HttpNtlmAuth
+
+from tfs.pool import add_connect_time
+from tfs.pool import PoolStats
+from tfs.pool import TFSHTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+class RequestsTransport:
+    name = "requests"
+
+    def __init__(
+        self,
+        auth=None,
+        headers=None,
+        verify=False,
+        timeout=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        max_retries=0,
+    ):
+        """
+        Send requests with ``requests.Session``
+
+        :param auth: ``requests`` authentication object or None
+        :param headers: headers of all requests, e.g. Authorization
+        :param verify: True|False|path to CA bundle - verify HTTPS cert
+        :param timeout: (connect timeout, read timeout), sec or None
+        """
+        self.verify = verify
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.adapter = TFSHTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+            pool_block=pool_block,
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.auth = auth
+        self.session.headers.update(headers or {})
+
+    def request(self, method, url, params=None, data=None, headers=None, stream=False):
+        """
+        :param data: encoded body of the request
+        :return: ``requests.Response``
+        """
+        return self.session.request(
+            method,
+            url,
+            params=params,
+            data=data,
+            headers=headers,
+            verify=self.verify,
+            timeout=self.timeout,
+            stream=stream,
+        )
+
+    def pool_stats(self):
+        return self.adapter.stats.snapshot()
+
+    def close(self):
+        self.session.close()
+
+
+class HttpxTransport:
+    name = "httpx"
+
+    def __init__(
+        self,
+        auth=None,
+        headers=None,
+        verify=False,
+        timeout=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        max_retries=0,
+        http2=True,
+    ):
+        """
+        Send requests with ``httpx.Client``, HTTP/2 is negotiated for HTTPS servers supporting it,
+        so concurrent requests share one connection. Requires ``pip install httpx[http2]``
+
+        Parameters are the same as of :class:`RequestsTransport`, ``pool_connections`` is not used
+
+        :param auth: ``requests.auth.HTTPBasicAuth``, ``requests.auth.HTTPDigestAuth``,
+            ``httpx.Auth`` or None. NTLM (``requests_ntlm.HttpNtlmAuth``) is not supported
+        :param http2: False - use HTTP/1.1 only
+        """
+        if httpx is None:
+            raise ImportError(
+                "httpx transport requires httpx, install it with: pip install httpx[http2]"
+            )
+        self.verify = verify
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self._local = threading.local()
+        if not isinstance(max_retries, int):
+            # urllib3.Retry
+            max_retries = max_retries.total or 0
+        limits = httpx.Limits(
+            max_connections=pool_maxsize if pool_block else None,
+            max_keepalive_connections=pool_maxsize,
+        )
+        self.session = httpx.Client(
+            auth=self._auth(auth),
+            headers=headers,
+            timeout=self._timeout(timeout),
+            follow_redirects=True,
+            transport=httpx.HTTPTransport(
+                verify=self._verify(verify),
+                http2=http2,
+                limits=limits,
+                retries=max_retries,
+            ),
+        )
+
+    @staticmethod
+    def _auth(auth):
+        if auth is None or isinstance(auth, httpx.Auth):
+            return auth
+        if isinstance(auth, HTTPBasicAuth):
+            return httpx.BasicAuth(auth.username, auth.password)
+        if isinstance(auth, HTTPDigestAuth):
+            return httpx.DigestAuth(auth.username, auth.password)
+        if isinstance(auth, HttpNtlmAuth):
+            raise ValueError(
+                "httpx transport doesn't support NTLM authentication (HttpNtlmAuth): "
+                "it authenticates connections, which HTTP/2 multiplexes. "
+                'Use transport="requests" or an httpx.Auth class as auth_type'
+            )
+        raise ValueError(
+            "httpx transport supports only HTTPBasicAuth, HTTPDigestAuth or httpx.Auth, "
+            "got {}".format(type(auth).__name__)
+        )
+
+    @staticmethod
+    def _timeout(timeout):
+        """Translate ``requests``-like timeout parameter"""
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+            return httpx.Timeout(read_timeout, connect=connect_timeout)
+        return httpx.Timeout(timeout)
+
+    @staticmethod
+    def _verify(verify):
+        """Translate ``requests``-like verify parameter"""
+        if isinstance(verify, str):
+            return ssl.create_default_context(cafile=verify)
+        return bool(verify)
+
+    @staticmethod
+    def _url(url, params):
+        """Add parameters to the query of the url like ``requests`` does:
+        skip None, send booleans as True/False and keep the existing query
+        """
+        query = urlencode(
+            [
+                (key, str(value) if isinstance(value, bool) else value)
+                for key, value in (params or {}).items()
+                if value is not None
+            ],
+            doseq=True,
+        )
+        if not query:
+            return url
+        url, _, fragment = url.partition("#")
+        url += ("&" if "?" in url else "?") + query
+        return url + "#" + fragment if fragment else url
+
+    def _trace(self, event, info):
+        """httpcore trace hook: count new connections and time spent to open them"""
+        if event in ("connection.connect_tcp.started", "connection.start_tls.started"):
+            if event == "connection.connect_tcp.started":
+                self.stats.add("created")
+            self._local.connect_started = time.perf_counter()
+        elif event.startswith(
+            ("connection.connect_tcp.", "connection.start_tls.")
+        ) and event.endswith((".complete", ".failed")):
+            add_connect_time(time.perf_counter() - self._local.connect_started)
+
+    def request(self, method, url, params=None, data=None, headers=None, stream=False):
+        """
+        :param data: encoded body of the request
+        :return: :class:`HttpxResponse`
+        """
+        request = self.session.build_request(
+            method,
+            self._url(url, params),
+            content=data,
+            headers=headers,
+            extensions={"trace": self._trace},
+        )
+        self.stats.add("taken")
+        started = time.perf_counter()
+        try:
+            response = self.session.send(request, stream=True)
+            elapsed = time.perf_counter() - started
+            if not stream:
+                try:
+                    response.read()
+                finally:
+                    response.close()
+        except httpx.TransportError as e:
+            raise _requests_error(e) from e
+        return HttpxResponse(response, timedelta(seconds=elapsed))
+
+    def pool_stats(self):
+        return self.stats.snapshot()
+
+    def close(self):
+        self.session.close()
+
+
+def _requests_error(error):
+    """Exception of ``requests`` corresponding to ``httpx.TransportError``"""
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(str(error))
+    if isinstance(error, httpx.ReadTimeout):
+        return requests.exceptions.ReadTimeout(str(error))
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(error))
+    if isinstance(error, (httpx.RemoteProtocolError, httpx.ReadError)):
+        return requests.exceptions.ChunkedEncodingError(str(error))
+    return requests.exceptions.ConnectionError(str(error))
+
+
+class _RequestBody:
+    def __init__(self, request):
+        self.method = request.method
+        self.url = str(request.url)
+        self.headers = request.headers
+        self.body = request.content
+
+
+class HttpxResponse:
+    """``httpx.Response`` with the interface of ``requests.Response`` used by TFSHTTPClient"""
+
+    def __init__(self, response, elapsed):
+        self._response = response
+        self.request = _RequestBody(response.request)
+        # Time to the response headers like in requests
+        self.elapsed = elapsed
+
+    @property
+    def status_code(self):
+        return self._response.status_code
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def reason(self):
+        return self._response.reason_phrase
+
+    @property
+    def url(self):
+        return str(self._response.url)
+
+    @property
+    def http_version(self):
+        return self._response.http_version
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    @property
+    def text(self):
+        self._response.read()
+        return self._response.text
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+    def iter_content(self, chunk_size=1):
+        try:
+            for chunk in self._response.iter_bytes(chunk_size):
+                yield chunk
+        except httpx.TransportError as e:
+            raise _requests_error(e) from e
+
+    def raise_for_status(self):
+        """Raise ``requests.HTTPError`` like ``requests.Response.raise_for_status``"""
+        if 400 <= self.status_code < 500:
+            kind = "Client Error"
+        elif 500 <= self.status_code < 600:
+            kind = "Server Error"
+        else:
+            return
+        raise requests.HTTPError(
+            "{} {}: {} for url: {}".format(
+                self.status_code, kind, self.reason, self.url
+            ),
+            response=self,
+        )
+
+    def close(self):
+        self._response.close()
+
+
+TRANSPORTS = {
+    RequestsTransport.name: RequestsTransport,
+    HttpxTransport.name: HttpxTransport,
+}